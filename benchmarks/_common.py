@@ -0,0 +1,22 @@
+"""Helpers shared by the benchmark scripts."""
+from pathlib import Path
+
+import numpy as np
+
+
+def collect_files(paths):
+    """Documents to benchmark: files as given, directories walked for the formats the server ingests."""
+    from bulk_ingest import is_supported
+    
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob('*') if p.is_file() and is_supported(p.name)))
+        else:
+            files.append(path)
+    return files
+
+
+def normalize(vectors):
+    """Unit-length rows as a contiguous float32 matrix."""
+    return np.ascontiguousarray(vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None), dtype=np.float32)
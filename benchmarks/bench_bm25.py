@@ -0,0 +1,95 @@
+"""
+Benchmark: BM25 index build time, size and lexical lookup latency.
+
+Chunks the given documents (repeated --copies times, each copy with its own
+part-number-style token so the corpus grows like a real one), builds the
+BM25 index, saves it to a temporary directory, and times lookups of
+--queries short phrases drawn from the chunks, each with one copy's token
+mixed in, as exact-code queries would.
+
+Each query is timed twice: cold, with the per-term score cache emptied first
+(as for every query term after a write), and warm, once all queries have run.
+
+Usage:
+    python benchmarks/bench_bm25.py [FILE_OR_DIR ...] [--copies 20] [--queries 500] [--top-k 20]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from _common import collect_files
+from bm25_index import BM25Index, tokenize
+from document_processor import DocumentProcessor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['sample_documents'])
+    parser.add_argument('--copies', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    processor = DocumentProcessor()
+    chunks = []
+    for file_path in collect_files(args.paths):
+        result = processor.process_document(str(file_path), file_path.name)
+        if result["success"]:
+            chunks.extend(result["chunks"])
+    if not chunks:
+        print("[ERROR] No chunks extracted")
+        return 1
+    
+    ids = []
+    documents = []
+    for copy in range(args.copies):
+        for i, chunk in enumerate(chunks):
+            ids.append(f"{copy}-{i}")
+            documents.append(f"{chunk} PN-{copy:05d}-{i}")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        index = BM25Index(directory)
+        start = time.perf_counter()
+        index.add(ids, documents)
+        build_seconds = time.perf_counter() - start
+        index.flush()
+        size_mb = (Path(directory) / "bm25.npz").stat().st_size / 1e6
+        
+        random.seed(args.seed)
+        queries = []
+        for _ in range(args.queries):
+            words = tokenize(random.choice(chunks))
+            start_word = random.randrange(max(1, len(words) - 3))
+            phrase = " ".join(words[start_word:start_word + random.randint(1, 3)])
+            queries.append(f"{phrase} PN-{random.randrange(args.copies):05d}-{random.randrange(len(chunks))}")
+        
+        latencies = {"cold": [], "warm": []}
+        for query in queries:
+            index.term_scores.clear()
+            start = time.perf_counter()
+            index.search(query, args.top_k)
+            latencies["cold"].append((time.perf_counter() - start) * 1000)
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.top_k)
+            latencies["warm"].append((time.perf_counter() - start) * 1000)
+        stats = index.get_stats()
+    
+    print(f"Chunks: {stats['chunks']}  Terms: {stats['terms']}  Postings: {stats['postings']}")
+    print(f"Build: {build_seconds:.2f}s  Saved index: {size_mb:.1f} MB")
+    for name, times in latencies.items():
+        p50, p95, p99 = np.percentile(times, [50, 95, 99])
+        print(f"Lookup {name} (top {args.top_k}): p50 {p50:.3f} ms  p95 {p95:.3f} ms  p99 {p99:.3f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Benchmark: character chunker vs. token-aware chunker.
+
+Reports chunking throughput and retrieval hit rate for both strategies.
+Queries are sentences sampled from the corpus; a query is a hit when one of
+the top-k retrieved chunks contains it. Character chunks longer than the
+embedding model's max sequence length lose their tail to truncation, which
+shows up here as misses.
+
+It also times the token-aware chunker on documents of --unpunctuated-pages
+pages with no sentence punctuation (as from scanned or tabular PDFs), built
+from corpus words. The time per page should stay flat as documents grow.
+
+Usage:
+    python benchmarks/bench_chunking.py [FILE_OR_DIR ...] [--queries 200] [--top-k 5] [--repeat 20]
+                                        [--unpunctuated-pages 200 400 800]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from _common import collect_files
+from config import settings
+from document_processor import DocumentProcessor, SENTENCE_BOUNDARY
+
+
+def load_pages(processor, files):
+    """Cleaned pages per file, loaded once so extraction is not part of the timing."""
+    return {str(f): list(processor.clean_pages(processor.iter_pages(str(f)))) for f in files}
+
+
+def time_chunker(chunker, corpus, repeat):
+    total_chars = sum(len(text) for pages in corpus.values() for _, text in pages) * repeat
+    num_chunks = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pages in corpus.values():
+            num_chunks += sum(1 for _ in chunker(pages))
+    elapsed = time.perf_counter() - start
+    return num_chunks / elapsed, total_chars / elapsed / 1e6
+
+
+def hit_rate(model, chunks, queries, top_k):
+    chunk_vectors = model.encode(chunks, convert_to_numpy=True, normalize_embeddings=True)
+    query_vectors = model.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+    scores = query_vectors @ chunk_vectors.T
+    k = min(top_k, len(chunks))
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    hits = sum(
+        any(query in chunks[i] for i in row)
+        for query, row in zip(queries, top)
+    )
+    return hits / len(queries)
+
+
+def time_unpunctuated(chunker, words, num_pages, page_chars=3500):
+    """Seconds to chunk num_pages pages of words with no sentence punctuation."""
+    pages = []
+    for page_number in range(1, num_pages + 1):
+        page = []
+        length = 0
+        while length < page_chars:
+            word = random.choice(words)
+            page.append(word)
+            length += len(word) + 1
+        pages.append((page_number, ' '.join(page)))
+    start = time.perf_counter()
+    num_chunks = sum(1 for _ in chunker(pages))
+    return time.perf_counter() - start, num_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['sample_documents'])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the corpus for the throughput timing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--unpunctuated-pages', type=int, nargs='+', default=[200, 400, 800])
+    args = parser.parse_args()
+    
+    from sentence_transformers import SentenceTransformer
+    
+    processor = DocumentProcessor()
+    corpus = load_pages(processor, collect_files(args.paths))
+    model = SentenceTransformer(settings.embedding_model)
+    
+    sentences = [
+        sentence
+        for pages in corpus.values()
+        for _, text in pages
+        for sentence in SENTENCE_BOUNDARY.split(text)
+        if len(sentence.split()) >= 6
+    ]
+    random.seed(args.seed)
+    queries = random.sample(sentences, min(args.queries, len(sentences)))
+    
+    strategies = {
+        f"characters ({settings.chunk_size}/{settings.chunk_overlap})": processor.chunk_pages,
+        f"tokens ({settings.chunk_max_tokens}/{settings.chunk_overlap_tokens})": processor.chunk_pages_by_tokens,
+    }
+    
+    print(f"Files: {len(corpus)}  Queries: {len(queries)}  Model: {settings.embedding_model} "
+          f"(max_seq_length={model.max_seq_length})")
+    print(f"{'strategy':<28} {'chunks':>7} {'chunks/s':>10} {'MB/s':>7} {f'hit@{args.top_k}':>7}")
+    for name, chunker in strategies.items():
+        chunks = [c["text"] for pages in corpus.values() for c in chunker(pages)]
+        chunks_per_sec, mb_per_sec = time_chunker(chunker, corpus, args.repeat)
+        rate = hit_rate(model, chunks, queries, args.top_k)
+        print(f"{name:<28} {len(chunks):>7} {chunks_per_sec:>10.0f} {mb_per_sec:>7.2f} {rate:>7.1%}")
+    
+    words = [
+        word.strip('.!?')
+        for pages in corpus.values()
+        for _, text in pages
+        for word in text.split()
+    ]
+    words = [word for word in words if word] or ["lorem", "ipsum", "dolor"]
+    print("\nTokens strategy, pages with no sentence punctuation (~3.5 KB each):")
+    print(f"{'pages':>7} {'chunks':>7} {'seconds':>8} {'ms/page':>8}")
+    for num_pages in args.unpunctuated_pages:
+        elapsed, num_chunks = time_unpunctuated(processor.chunk_pages_by_tokens, words, num_pages)
+        print(f"{num_pages:>7} {num_chunks:>7} {elapsed:>8.2f} {elapsed / num_pages * 1000:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: recall@k vs. index memory for reduced embedding dimensions.
+
+Embeds the chunks of the given documents and a sample of queries (sentences
+drawn from the corpus), then compares exact top-k retrieval with full-size
+vectors against PCA-projected and truncated (Matryoshka) vectors at each
+--dims size. recall@k is the overlap of each query's top-k with the full-size
+top-k. Memory is the raw float32 vector storage; HNSW graph overhead comes on
+top and does not depend on the dimension. Truncation only retains quality for
+Matryoshka-trained models.
+
+Usage:
+    python benchmarks/bench_dim_reduction.py [FILE_OR_DIR ...] [--dims 256 128 64] [--top-k 5] [--queries 200]
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from _common import collect_files
+from config import settings
+from dim_reduction import EmbeddingReducer
+from document_processor import DocumentProcessor, SENTENCE_BOUNDARY
+
+
+def top_k(queries, chunks, k):
+    scores = queries @ chunks.T
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def recall(reference, candidate):
+    k = reference.shape[1]
+    return np.mean([len(set(r) & set(c)) / k for r, c in zip(reference, candidate)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['sample_documents'])
+    parser.add_argument('--dims', type=int, nargs='+', default=[256, 128, 64])
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    from embedding_backends import load_embedding_model
+    
+    processor = DocumentProcessor()
+    chunks = []
+    for file_path in collect_files(args.paths):
+        result = processor.process_document(str(file_path), file_path.name)
+        if result["success"]:
+            chunks.extend(result["chunks"])
+    sentences = [s for chunk in chunks for s in SENTENCE_BOUNDARY.split(chunk) if len(s.split()) >= 6]
+    random.seed(args.seed)
+    queries = random.sample(sentences, min(args.queries, len(sentences)))
+    k = min(args.top_k, len(chunks))
+    
+    model = load_embedding_model()
+    chunk_vectors = np.asarray(model.encode(chunks, batch_size=settings.embedding_batch_size, convert_to_numpy=True), dtype=np.float32)
+    query_vectors = np.asarray(model.encode(queries, batch_size=settings.embedding_batch_size, convert_to_numpy=True), dtype=np.float32)
+    full_dim = chunk_vectors.shape[1]
+    identity = EmbeddingReducer("truncate", full_dim)
+    reference = top_k(identity.transform(query_vectors), identity.transform(chunk_vectors), k)
+    
+    print(f"Model: {settings.embedding_model}  Chunks: {len(chunks)}  Queries: {len(queries)}")
+    print(f"{'reduction':<14} {'dim':>5} {f'recall@{k}':>9} {'MB':>8} {'MB/1M chunks':>13}")
+    print(f"{'none':<14} {full_dim:>5} {1.0:>9.3f} {len(chunks) * full_dim * 4 / 1e6:>8.2f} {full_dim * 4:>13.0f}")
+    for dim in args.dims:
+        if dim >= full_dim:
+            continue
+        reducers = {"truncate": EmbeddingReducer("truncate", dim)}
+        if dim <= len(chunks):
+            reducers["pca"] = EmbeddingReducer.fit_pca(chunk_vectors, dim)
+        for name, reducer in reducers.items():
+            found = top_k(reducer.transform(query_vectors), reducer.transform(chunk_vectors), k)
+            print(f"{name:<14} {dim:>5} {recall(reference, found):>9.3f} "
+                  f"{len(chunks) * dim * 4 / 1e6:>8.2f} {dim * 4:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
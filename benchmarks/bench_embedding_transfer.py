@@ -0,0 +1,110 @@
+"""
+Benchmark: Python lists vs. contiguous float32 arrays for embeddings.
+
+Times real collection.add and collection.query calls on an in-memory Chroma
+client, once passing .tolist() copies as the store did before chromadb 0.5
+and once passing the float32 arrays as to_store_embeddings now does. Queries
+are single vectors, as /query sends them.
+
+With --synthetic, also isolates the conversion itself: the list path
+converts the encoder's ndarray with .tolist() and back into an array, the
+array path passes the matrix through. Reports time and peak traced memory
+for each, plus the per-query overhead for a single query vector.
+
+Usage:
+    python benchmarks/bench_embedding_transfer.py [--chunks 50000] [--dim 384] [--batch 64] [--queries 1000] [--synthetic]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def list_round_trip(batch):
+    as_lists = batch.tolist()
+    return np.asarray(as_lists, dtype=np.float32)
+
+
+def array_pass_through(batch):
+    return np.ascontiguousarray(batch, dtype=np.float32)
+
+
+def measure(convert, embeddings, batch_size):
+    """Time one pass, then trace a second pass for peak memory (tracing skews timing)."""
+    start = time.perf_counter()
+    for i in range(0, len(embeddings), batch_size):
+        convert(embeddings[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    
+    tracemalloc.start()
+    for i in range(0, len(embeddings), batch_size):
+        convert(embeddings[i:i + batch_size])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def measure_query(convert, dim, repeats=10000):
+    vector = np.random.rand(dim).astype(np.float32)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        convert(vector[np.newaxis, :])
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def measure_chroma(embeddings, queries, batch_size, use_arrays):
+    """Seconds to add all embeddings, and mean microseconds per single-vector query."""
+    import chromadb
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(f"bench_{int(use_arrays)}_{time.time_ns()}", metadata={"hnsw:space": "cosine"})
+    convert = (lambda batch: batch) if use_arrays else (lambda batch: batch.tolist())
+    start = time.perf_counter()
+    for i in range(0, len(embeddings), batch_size):
+        batch = embeddings[i:i + batch_size]
+        collection.add(ids=[str(j) for j in range(i, i + len(batch))], embeddings=convert(batch))
+    add_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for query in queries:
+        collection.query(query_embeddings=convert(query[np.newaxis, :]), n_results=5, include=[])
+    query_us = (time.perf_counter() - start) / len(queries) * 1e6
+    return add_seconds, query_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--batch', type=int, default=64)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--synthetic', action='store_true', help='Also time the conversion alone, without Chroma')
+    args = parser.parse_args()
+    
+    import chromadb
+    from chroma_store import CHROMA_ACCEPTS_NUMPY
+    
+    embeddings = np.random.rand(args.chunks, args.dim).astype(np.float32)
+    queries = np.random.rand(args.queries, args.dim).astype(np.float32)
+    print(f"{args.chunks} x {args.dim} float32 embeddings ({embeddings.nbytes / 1e6:.1f} MB), batch {args.batch}")
+    print(f"Chroma {chromadb.__version__}: {'arrays accepted' if CHROMA_ACCEPTS_NUMPY else 'requires lists (upgrade to chromadb>=0.5)'}")
+    print(f"{'path':<18} {'add s':>9} {'query us':>9}")
+    paths = (("lists", False), ("float32 arrays", True)) if CHROMA_ACCEPTS_NUMPY else (("lists", False),)
+    for name, use_arrays in paths:
+        add_seconds, query_us = measure_chroma(embeddings, queries, args.batch, use_arrays)
+        print(f"{name:<18} {add_seconds:>9.2f} {query_us:>9.1f}")
+    
+    if args.synthetic:
+        print(f"\nConversion only\n{'path':<18} {'ingest s':>9} {'peak MB':>9} {'query us':>9}")
+        for name, convert in (("list round-trip", list_round_trip), ("float32 array", array_pass_through)):
+            elapsed, peak = measure(convert, embeddings, args.batch)
+            per_query = measure_query(convert, args.dim)
+            print(f"{name:<18} {elapsed:>9.3f} {peak / 1e6:>9.1f} {per_query:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: FAISS IVF-PQ vs. exact search at large corpus sizes.
+
+Generates clustered synthetic vectors (or loads an .npy matrix with
+--vectors), builds an IVF-PQ index with the given nlist / m / bits and reports
+index memory against raw float32 storage, build time (train + add), and for
+each --nprobe value the per-query latency (p50/p95) and recall@k against
+exact NumPy top-k on the same normalized vectors.
+
+Usage:
+    python benchmarks/bench_faiss_ivfpq.py [--n 1000000] [--dim 384] [--nlist 1024] [--pq-m 16]
+        [--nprobe 4 16 64] [--queries 200] [--top-k 5] [--vectors corpus.npy]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from _common import normalize
+from faiss_store import HAS_FAISS, make_ivfpq_index
+
+
+def synthetic_vectors(n, dim, clusters, rng):
+    """Unit vectors drawn around random centres, roughly like embedding topics."""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors
+
+
+def exact_top_k(queries, vectors, k, block=100000):
+    """Exact top-k by inner product, scanning the corpus in blocks to bound memory."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        scores = queries @ vectors[start:start + block].T
+        scores = np.concatenate([best_scores, scores], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(np.arange(start, start + scores.shape[1] - k), (len(queries), scores.shape[1] - k))], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return best_ids
+
+
+def recall(reference, candidate):
+    k = reference.shape[1]
+    return np.mean([len(set(r) & set(c)) / k for r, c in zip(reference, candidate)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n', type=int, default=1000000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--vectors', help='.npy matrix to index instead of synthetic data')
+    parser.add_argument('--nlist', type=int, default=1024)
+    parser.add_argument('--pq-m', type=int, default=16)
+    parser.add_argument('--pq-bits', type=int, default=8)
+    parser.add_argument('--train-size', type=int, default=50000)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    if not HAS_FAISS:
+        print("[ERROR] faiss-cpu is not installed")
+        return 1
+    import faiss
+    
+    rng = np.random.default_rng(args.seed)
+    if args.vectors:
+        vectors = normalize(np.load(args.vectors))
+    else:
+        vectors = normalize(synthetic_vectors(args.n, args.dim, max(args.nlist, 64), rng))
+    n, dim = vectors.shape
+    # Queries are perturbed corpus vectors, so each has near neighbours
+    queries = normalize(vectors[rng.choice(n, args.queries, replace=False)] + 0.1 * rng.standard_normal((args.queries, dim)).astype(np.float32))
+    
+    start = time.perf_counter()
+    index = make_ivfpq_index(dim, args.nlist, args.pq_m, args.pq_bits)
+    index.train(vectors[rng.choice(n, min(args.train_size, n), replace=False)])
+    train_seconds = time.perf_counter() - start
+    index.add_with_ids(vectors, np.arange(n, dtype=np.int64))
+    build_seconds = time.perf_counter() - start
+    index_mb = len(faiss.serialize_index(index)) / 1e6
+    
+    reference = exact_top_k(queries, vectors, args.top_k)
+    start = time.perf_counter()
+    for query in queries:
+        query @ vectors.T
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    
+    print(f"Vectors: {n} x {dim}  nlist={args.nlist}  m={args.pq_m}  bits={args.pq_bits}")
+    print(f"Memory: {index_mb:.1f} MB IVF-PQ vs {n * dim * 4 / 1e6:.1f} MB float32")
+    print(f"Build: {build_seconds:.1f}s (train {train_seconds:.1f}s)")
+    print(f"Exact NumPy search: {exact_ms:.2f} ms/query")
+    print(f"{'nprobe':>7} {'p50 ms':>8} {'p95 ms':>8} {f'recall@{args.top_k}':>9}")
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        latencies = []
+        found = []
+        for query in queries:
+            start = time.perf_counter()
+            _, ids = index.search(query[np.newaxis], args.top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(ids[0])
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"{nprobe:>7} {p50:>8.3f} {p95:>8.3f} {recall(reference, np.asarray(found)):>9.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
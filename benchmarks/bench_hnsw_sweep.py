@@ -0,0 +1,118 @@
+"""
+Benchmark: HNSW recall/latency sweep against exact search.
+
+Loads the stored chunk vectors of the configured vector store (or an .npy
+matrix with --vectors), holds out --queries of them as queries and indexes the
+rest with hnswlib, the library behind Chroma's index, once per (M,
+construction_ef) pair. Each index is then searched at every --ef value, and
+the p50/p95 per-query latency and recall@k against exact NumPy top-k are
+reported. Rows marked * are on the recall/latency frontier: no other setting
+is both faster at p50 and at least as accurate. Use the result to pick
+HNSW_M / HNSW_CONSTRUCTION_EF / HNSW_SEARCH_EF, or per-request "ef" values.
+
+Usage:
+    python benchmarks/bench_hnsw_sweep.py [--vectors corpus.npy] [--m 8 16 32] [--construction-ef 100 200]
+        [--ef 10 20 40 80 160] [--queries 200] [--top-k 5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from _common import normalize
+
+try:
+    import hnswlib  # Installed with chromadb (chroma-hnswlib)
+    HAS_HNSWLIB = True
+except ImportError:
+    HAS_HNSWLIB = False
+
+
+def load_store_vectors():
+    from rag_engine import open_configured_store
+    
+    store = open_configured_store()
+    batches = [embeddings for _, _, embeddings in store.iter_entries(batch_size=4096)]
+    store.close()
+    return np.vstack(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+
+
+def exact_top_k(queries, vectors, k):
+    scores = queries @ vectors.T
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def recall(reference, candidate):
+    k = reference.shape[1]
+    return np.mean([len(set(r) & set(c)) / k for r, c in zip(reference, candidate)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', help='.npy matrix to use instead of the stored chunk vectors')
+    parser.add_argument('--m', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--construction-ef', type=int, nargs='+', default=[100, 200])
+    parser.add_argument('--ef', type=int, nargs='+', default=[10, 20, 40, 80, 160])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    if not HAS_HNSWLIB:
+        print("[ERROR] hnswlib is not installed (it comes with chromadb as chroma-hnswlib)")
+        return 1
+    
+    vectors = normalize(np.load(args.vectors) if args.vectors else load_store_vectors())
+    if len(vectors) <= args.queries + args.top_k:
+        print(f"[ERROR] Need more than {args.queries + args.top_k} vectors, have {len(vectors)}")
+        return 1
+    rng = np.random.default_rng(args.seed)
+    held_out = rng.permutation(len(vectors))
+    queries, corpus = vectors[held_out[:args.queries]], vectors[held_out[args.queries:]]
+    n, dim = corpus.shape
+    k = args.top_k
+    
+    reference = exact_top_k(queries, corpus, k)
+    start = time.perf_counter()
+    for query in queries:
+        scores = corpus @ query
+        np.argpartition(-scores, k - 1)[:k]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    
+    print(f"Corpus: {n} x {dim}  Queries: {len(queries)} (held out)")
+    print(f"Exact NumPy search: {exact_ms:.3f} ms/query")
+    rows = []
+    for m in args.m:
+        for construction_ef in args.construction_ef:
+            index = hnswlib.Index(space='cosine', dim=dim)
+            start = time.perf_counter()
+            index.init_index(max_elements=n, M=m, ef_construction=construction_ef, random_seed=args.seed)
+            index.add_items(corpus, np.arange(n))
+            build_seconds = time.perf_counter() - start
+            index.set_num_threads(1)
+            for ef in args.ef:
+                index.set_ef(ef)
+                latencies = []
+                found = []
+                for query in queries:
+                    start = time.perf_counter()
+                    labels, _ = index.knn_query(query[np.newaxis], k=k)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    found.append(labels[0])
+                p50, p95 = np.percentile(latencies, [50, 95])
+                rows.append((m, construction_ef, ef, build_seconds, p50, p95, recall(reference, np.asarray(found))))
+    
+    print(f"{'M':>4} {'build_ef':>9} {'ef':>5} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {f'recall@{k}':>9}")
+    for m, construction_ef, ef, build_seconds, p50, p95, row_recall in rows:
+        dominated = any(other[4] < p50 and other[6] >= row_recall for other in rows)
+        marker = ' ' if dominated else '*'
+        print(f"{m:>4} {construction_ef:>9} {ef:>5} {build_seconds:>8.2f} {p50:>8.3f} {p95:>8.3f} {row_recall:>9.3f} {marker}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark: PyTorch vs. ONNX Runtime (fp32 and int8) embedding backends.
+
+Chunks the given documents with the configured chunker, embeds the chunks
+with each backend and reports chunks/sec, plus the cosine similarity of each
+ONNX embedding against the PyTorch one for the same chunk (parity check).
+Exits with status 1 if any ONNX variant's minimum cosine falls below
+--min-cosine, so it can gate switching a deployment to EMBEDDING_BACKEND=onnx.
+
+Usage:
+    python benchmarks/bench_onnx_backend.py [FILE_OR_DIR ...] [--batch 64] [--repeat 3] [--min-cosine 0.99]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from _common import collect_files, normalize
+from config import settings
+from document_processor import DocumentProcessor
+
+
+def time_encode(model, chunks, batch_size, repeat):
+    model.encode(chunks[:batch_size], batch_size=batch_size)  # Warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        embeddings = model.encode(chunks, batch_size=batch_size, convert_to_numpy=True)
+    elapsed = time.perf_counter() - start
+    return np.asarray(embeddings, dtype=np.float32), len(chunks) * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['sample_documents'])
+    parser.add_argument('--batch', type=int, default=settings.embedding_batch_size)
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the chunks for the throughput timing')
+    parser.add_argument('--threads', type=int, default=settings.onnx_num_threads, help='ONNX Runtime threads (0 = all cores)')
+    parser.add_argument('--min-cosine', type=float, default=0.99)
+    args = parser.parse_args()
+    
+    from sentence_transformers import SentenceTransformer
+    from embedding_backends import OnnxEmbeddingModel
+    
+    processor = DocumentProcessor()
+    chunks = []
+    for file_path in collect_files(args.paths):
+        result = processor.process_document(str(file_path), file_path.name)
+        if result["success"]:
+            chunks.extend(result["chunks"])
+    if not chunks:
+        sys.exit("No chunks produced from the given paths")
+    
+    backends = {
+        "torch": SentenceTransformer(settings.embedding_model, device="cpu"),
+        "onnx fp32": OnnxEmbeddingModel(settings.embedding_model, settings.onnx_model_dir, quantize=False, num_threads=args.threads),
+        "onnx int8": OnnxEmbeddingModel(settings.embedding_model, settings.onnx_model_dir, quantize=True, num_threads=args.threads),
+    }
+    
+    print(f"Model: {settings.embedding_model}  Chunks: {len(chunks)}  Batch: {args.batch}")
+    print(f"{'backend':<10} {'chunks/s':>9} {'speedup':>8} {'min cos':>8} {'mean cos':>9}")
+    reference = None
+    baseline = None
+    parity_ok = True
+    for name, model in backends.items():
+        embeddings, chunks_per_sec = time_encode(model, chunks, args.batch, args.repeat)
+        if reference is None:
+            reference, baseline = normalize(embeddings), chunks_per_sec
+            print(f"{name:<10} {chunks_per_sec:>9.1f} {1.0:>7.2f}x {'-':>8} {'-':>9}")
+            continue
+        cosines = np.sum(reference * normalize(embeddings), axis=1)
+        parity_ok = parity_ok and cosines.min() >= args.min_cosine
+        print(f"{name:<10} {chunks_per_sec:>9.1f} {chunks_per_sec / baseline:>7.2f}x "
+              f"{cosines.min():>8.4f} {cosines.mean():>9.4f}")
+    
+    if not parity_ok:
+        print(f"\nParity check FAILED: cosine similarity below {args.min_cosine}")
+        sys.exit(1)
+    print(f"\nParity check passed (all cosine similarities >= {args.min_cosine})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: cross-encoder rerank latency by candidate count and batch size.
+
+Takes chunk texts from the configured vector store, builds --queries short
+queries from random chunk phrases, and times scoring --candidates chunks per
+query with the reranker model (RERANK_MODEL) on CPU at each --batch-size, with
+no latency cap. Use the p95 to pick RERANK_CANDIDATES, RERANK_BATCH_SIZE and a
+RERANK_MAX_LATENCY_MS that rarely cuts scoring short.
+
+Usage:
+    python benchmarks/bench_rerank.py [--candidates 10 20 30 50] [--batch-size 8 16 32] [--queries 50]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from reranker import CrossEncoderReranker
+
+
+def load_store_texts(limit):
+    from rag_engine import open_configured_store
+    
+    store = open_configured_store()
+    texts = []
+    for _, documents in store.iter_documents(batch_size=1024):
+        texts.extend(documents)
+        if len(texts) >= limit:
+            break
+    store.close()
+    return texts[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=settings.rerank_model)
+    parser.add_argument('--candidates', type=int, nargs='+', default=[10, 20, 30, 50])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    texts = load_store_texts(max(args.candidates) * 20)
+    if len(texts) < max(args.candidates):
+        print(f"[ERROR] Need at least {max(args.candidates)} stored chunks, have {len(texts)}; ingest some documents first")
+        return 1
+    
+    random.seed(args.seed)
+    queries = []
+    for _ in range(args.queries):
+        words = random.choice(texts).split()
+        start_word = random.randrange(max(1, len(words) - 6))
+        queries.append(" ".join(words[start_word:start_word + 6]))
+    
+    print(f"Model: {args.model}  Queries: {len(queries)}")
+    print(f"{'candidates':>10} {'batch':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for batch_size in args.batch_size:
+        reranker = CrossEncoderReranker(args.model, batch_size=batch_size)
+        reranker.rerank(queries[0], [{"text": text} for text in texts[:batch_size]], 1)  # Warm-up
+        for num_candidates in args.candidates:
+            latencies = []
+            for query in queries:
+                candidates = [{"text": text} for text in random.sample(texts, num_candidates)]
+                start = time.perf_counter()
+                reranker.rerank(query, candidates, 1)
+                latencies.append((time.perf_counter() - start) * 1000)
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(f"{num_candidates:>10} {batch_size:>6} {p50:>8.1f} {p95:>8.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,437 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Words, numbers and joined codes such as "err-404", "x12.3b" or "v2_beta"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_./:]")
+
+# Very common words carry almost no BM25 weight but have the longest postings
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how in is it its of on or that the this to was were what when
+where which who why will with do does did can not no
+""".split())
+
+# Term frequencies are stored as uint16
+MAX_TERM_FREQUENCY = 65535
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased BM25 terms for a text.
+    
+    Joined codes are kept whole and also split into their parts, so
+    "ERR-404" matches both "err-404" and "err 404".
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in TOKEN_SEPARATORS.split(token) if part not in STOPWORDS)
+    return tokens
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]],
+    weights: List[float],
+    k: int = 60
+) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: each ID scores sum(weight / (k + rank)), best first."""
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda entry: entry[1], reverse=True)
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over chunk texts.
+    
+    Each term's postings are two typed arrays, document numbers (int32) and
+    term frequencies (uint16), appended to as chunks are added; a query
+    scores them with a few vectorized NumPy operations per term. Each
+    queried term's per-posting scores (idf times the length-normalized term
+    frequency) are cached until the next write, as are the per-chunk length
+    norms, so repeated terms cost one add over their postings. Deleted chunks are tombstoned and dropped from the postings once they make up a
+    quarter of the index.
+    
+    On disk the index is a snapshot, one .npz file (postings concatenated,
+    with per-term offsets) replaced atomically, plus a log of the adds and
+    deletes since then. flush() appends to the log, so ingesting a document
+    costs in proportion to the document rather than the index; the snapshot
+    is only rewritten once the log has grown larger than it, keeping the
+    total amortized linear. Opening the index replays the log.
+    """
+    
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.term_scores: Dict[str, Tuple[np.ndarray, float, Optional[np.ndarray]]] = {}
+        self.length_norms: Optional[np.ndarray] = None
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.log_lines: List[str] = []
+        self.snapshot_needed = False
+        if (self.path / "bm25.npz").exists():
+            self._load()
+        else:
+            self._reset()
+        self._replay_log()
+    
+    def _reset(self):
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.chunk_ids: List[str] = []
+        self.doc_numbers: Dict[str, int] = {}
+        self.doc_lengths = array('I')
+        self.alive = bytearray()
+        self.total_length = 0
+        self.dead = 0
+        self.dirty = True
+        self._clear_score_cache()
+        # Logged changes no longer apply to the emptied index
+        self.log_lines = []
+        self.snapshot_needed = True
+    
+    def _load(self):
+        with np.load(self.path / "bm25.npz") as data:
+            index = json.loads(data["index"].tobytes().decode("utf-8"))
+            offsets = data["offsets"]
+            docs = data["docs"]
+            frequencies = data["frequencies"]
+            self.doc_lengths = array('I', data["doc_lengths"].astype(np.uint32).tobytes())
+            self.alive = bytearray(data["alive"].tobytes())
+        self.chunk_ids = index["chunk_ids"]
+        self.postings = {}
+        for term, start, end in zip(index["terms"], offsets[:-1], offsets[1:]):
+            term_docs = array('i')
+            term_docs.frombytes(docs[start:end].tobytes())
+            term_frequencies = array('H')
+            term_frequencies.frombytes(frequencies[start:end].tobytes())
+            self.postings[term] = (term_docs, term_frequencies)
+        self.doc_numbers = {
+            chunk_id: doc for doc, chunk_id in enumerate(self.chunk_ids) if self.alive[doc]
+        }
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        self.total_length = int(lengths[np.frombuffer(self.alive, dtype=np.uint8).astype(bool)].sum())
+        self.dead = len(self.chunk_ids) - len(self.doc_numbers)
+    
+    def _replay_log(self):
+        """
+        Apply the changes logged since the snapshot was written.
+        
+        Replaying is idempotent (adds skip indexed IDs, deletes skip missing
+        ones), so a crash between writing a snapshot and removing the log
+        leaves a consistent index. A line cut short by a crash ends the
+        replay, and the next flush() rewrites the snapshot without it.
+        """
+        log_path = self.path / "bm25.log"
+        if not log_path.exists():
+            return
+        with open(log_path, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Later appends would follow the broken line, so start a new snapshot
+                    self.snapshot_needed = True
+                    self.dirty = True
+                    break
+                if "add" in entry:
+                    self._add_counts(entry["add"])
+                else:
+                    self.delete(entry["delete"])
+        self.log_lines = []
+    
+    def count(self) -> int:
+        return len(self.doc_numbers)
+    
+    def add(self, ids: List[str], documents: List[str]):
+        """Index chunk texts; IDs that are already indexed are skipped."""
+        with self.lock:
+            self._add_counts([
+                (chunk_id, Counter(tokenize(document)))
+                for chunk_id, document in zip(ids, documents)
+                if chunk_id not in self.doc_numbers
+            ])
+    
+    def _add_counts(self, entries: List[Tuple[str, Dict[str, int]]]):
+        """Index (chunk_id, term counts) pairs, skipping indexed IDs, and log them."""
+        with self.lock:
+            added = []
+            for chunk_id, counts in entries:
+                if chunk_id in self.doc_numbers:
+                    continue
+                doc = len(self.chunk_ids)
+                self.chunk_ids.append(chunk_id)
+                self.doc_numbers[chunk_id] = doc
+                length = sum(counts.values())
+                self.doc_lengths.append(length)
+                self.alive.append(1)
+                self.total_length += length
+                for term, frequency in counts.items():
+                    postings = self.postings.get(term)
+                    if postings is None:
+                        postings = self.postings[term] = (array('i'), array('H'))
+                    postings[0].append(doc)
+                    postings[1].append(min(frequency, MAX_TERM_FREQUENCY))
+                added.append((chunk_id, counts))
+            if added:
+                self.log_lines.append(json.dumps({"add": added}))
+            self.dirty = True
+            self._clear_score_cache()
+    
+    def delete(self, ids: Iterable[str]):
+        with self.lock:
+            removed = []
+            for chunk_id in ids:
+                doc = self.doc_numbers.pop(chunk_id, None)
+                if doc is None:
+                    continue
+                self.alive[doc] = 0
+                self.total_length -= self.doc_lengths[doc]
+                self.dead += 1
+                removed.append(chunk_id)
+            if removed:
+                self.log_lines.append(json.dumps({"delete": removed}))
+            if self.dead > max(1000, len(self.chunk_ids) // 4):
+                self.compact()
+            self.dirty = True
+            self._clear_score_cache()
+    
+    def compact(self):
+        """Drop deleted chunks from the postings and renumber the rest."""
+        with self.lock:
+            alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+            renumber = np.cumsum(alive, dtype=np.int64) - 1
+            postings = {}
+            for term, (docs, frequencies) in self.postings.items():
+                doc_array = np.frombuffer(docs, dtype=np.int32)
+                keep = alive[doc_array]
+                if not keep.any():
+                    continue
+                term_docs = array('i')
+                term_docs.frombytes(renumber[doc_array[keep]].astype(np.int32).tobytes())
+                term_frequencies = array('H')
+                term_frequencies.frombytes(np.frombuffer(frequencies, dtype=np.uint16)[keep].tobytes())
+                postings[term] = (term_docs, term_frequencies)
+            self.postings = postings
+            self.chunk_ids = [chunk_id for chunk_id, live in zip(self.chunk_ids, alive) if live]
+            self.doc_numbers = {chunk_id: doc for doc, chunk_id in enumerate(self.chunk_ids)}
+            self.doc_lengths = array('I', np.frombuffer(self.doc_lengths, dtype=np.uint32)[alive].tobytes())
+            self.alive = bytearray(b"\x01" * len(self.chunk_ids))
+            self.dead = 0
+            self.dirty = True
+            self._clear_score_cache()
+    
+    def _clear_score_cache(self):
+        """Forget cached per-term scores and length norms; called on every write."""
+        self.term_scores.clear()
+        self.length_norms = None
+    
+    def _query_terms(self, query: str, live: int) -> List[Tuple[np.ndarray, np.ndarray, float, Optional[np.ndarray]]]:
+        """
+        (docs, per-posting scores, max score, dense scores) for each indexed
+        query term, rarest first.
+        
+        Terms found in over half the chunks also get their scores spread
+        over one array indexed by chunk number (None for the others), so
+        they can be added or looked up without touching their long postings.
+        """
+        terms = []
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.int32)
+            cached = self.term_scores.get(term)
+            if cached is None:
+                frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                if self.length_norms is None:
+                    lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+                    self.length_norms = self.k1 * (1 - self.b + self.b * lengths / (self.total_length / live))
+                norm = self.length_norms[docs]
+                # Postings still include tombstoned chunks until compaction
+                frequency = min(len(docs), live)
+                idf = math.log(1 + (live - frequency + 0.5) / (frequency + 0.5))
+                scores = (np.float32(idf * (self.k1 + 1)) * frequencies / (frequencies + norm)).astype(np.float32)
+                dense = None
+                if len(docs) > live // 2:
+                    dense = np.zeros(len(self.chunk_ids), dtype=np.float32)
+                    dense[docs] = scores
+                cached = self.term_scores[term] = (scores, float(scores.max()), dense)
+            terms.append((docs, *cached))
+        terms.sort(key=lambda entry: len(entry[0]))
+        return terms
+    
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """The top_k (chunk_id, BM25 score) pairs for a query, best first."""
+        started = time.perf_counter()
+        results = self._search(query, top_k)
+        with self.lock:
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - started
+        return results
+    
+    def _search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """
+        Score a query against the index with MaxScore pruning.
+        
+        Candidates come from the postings of the rarest query terms; every
+        query term is then looked up for just those candidates, by binary
+        search in its postings (which are sorted by document number). Terms
+        are added to the candidate-generating set, rarest first, until the
+        top_k-th candidate outscores the best a chunk could get from the
+        remaining terms, so the result is exact. The one approximation: terms
+        found in over half the chunks (near-zero idf) only re-rank candidates
+        and never add chunks on their own, unless the query has nothing else.
+        When the candidate postings grow past 1/16 of the index, every
+        posting is scored densely instead.
+        """
+        with self.lock:
+            live = len(self.doc_numbers)
+            if live == 0 or top_k <= 0:
+                return []
+            terms = self._query_terms(query, live)
+            if not terms:
+                return []
+            alive = np.frombuffer(self.alive, dtype=np.uint8)
+            
+            # Best score a chunk can get from terms[i:] alone
+            bounds = [bound if dense is None else 0.0 for _, _, bound, dense in terms]
+            remaining = np.cumsum(bounds[::-1])[::-1].tolist() + [0.0]
+            candidate_postings = 0
+            for split in range(1, len(terms) + 1):
+                candidate_postings += len(terms[split - 1][0])
+                if candidate_postings > live // 16:
+                    break
+                candidates = np.unique(np.concatenate([docs for docs, _, _, _ in terms[:split]]))
+                if self.dead:
+                    candidates = candidates[alive[candidates] == 1]
+                if remaining[split] > 0 and len(candidates) < top_k:
+                    continue
+                scores = np.zeros(len(candidates), dtype=np.float32)
+                self._add_scores(terms, candidates, scores)
+                if len(scores) > top_k:
+                    best = np.argpartition(-scores, top_k - 1)[:top_k]
+                    candidates, scores = candidates[best], scores[best]
+                if remaining[split] == 0 or scores.min() >= remaining[split]:
+                    order = np.argsort(-scores)
+                    return [(self.chunk_ids[doc], float(score)) for doc, score in zip(candidates[order], scores[order])]
+            
+            scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+            for docs, term_scores, _, dense in terms:
+                if dense is None:
+                    # Each chunk appears once per postings list; add.at is the faster scatter for this
+                    np.add.at(scores, docs, term_scores)
+            matched = scores > 0
+            for _, _, _, dense in terms:
+                if dense is not None:
+                    scores += dense
+            if matched.any():
+                scores *= matched
+            if self.dead:
+                scores *= alive
+            # Selecting from the front: much faster than from the back when most scores are 0
+            candidates = np.argpartition(-scores, min(top_k, len(scores)) - 1)[:top_k]
+            candidates = candidates[scores[candidates] > 0]
+            ranked = candidates[np.argsort(-scores[candidates])]
+            return [(self.chunk_ids[doc], float(scores[doc])) for doc in ranked]
+    
+    @staticmethod
+    def _add_scores(
+        terms: List[Tuple[np.ndarray, np.ndarray, float, Optional[np.ndarray]]],
+        candidates: np.ndarray,
+        scores: np.ndarray
+    ):
+        """Add each term's scores for the (sorted) candidates, by binary search in its postings or from its dense scores."""
+        for docs, term_scores, _, dense in terms:
+            if dense is not None:
+                scores += dense[candidates]
+                continue
+            positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            found = docs[positions] == candidates
+            scores[found] += term_scores[positions[found]]
+    
+    def clear(self):
+        with self.lock:
+            self._reset()
+            self.flush()
+    
+    def flush(self):
+        """Persist changes: append them to the log, or rewrite the snapshot once the log outgrows it."""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            snapshot_path = self.path / "bm25.npz"
+            log_path = self.path / "bm25.log"
+            pending = "".join(line + "\n" for line in self.log_lines).encode("utf-8")
+            log_bytes = log_path.stat().st_size if log_path.exists() else 0
+            if (
+                self.snapshot_needed
+                or not snapshot_path.exists()
+                or log_bytes + len(pending) > snapshot_path.stat().st_size
+            ):
+                self._write_snapshot()
+                if log_path.exists():
+                    log_path.unlink()
+                self.snapshot_needed = False
+            elif pending:
+                with open(log_path, "ab") as log:
+                    log.write(pending)
+            self.log_lines = []
+            self.dirty = False
+    
+    def _write_snapshot(self):
+        """Write the whole index as one .npz file, replacing the previous one atomically."""
+        with self.lock:
+            terms = list(self.postings)
+            lengths = [len(self.postings[term][0]) for term in terms]
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            docs = np.empty(offsets[-1], dtype=np.int32)
+            frequencies = np.empty(offsets[-1], dtype=np.uint16)
+            for term, start, end in zip(terms, offsets[:-1], offsets[1:]):
+                docs[start:end] = np.frombuffer(self.postings[term][0], dtype=np.int32)
+                frequencies[start:end] = np.frombuffer(self.postings[term][1], dtype=np.uint16)
+            index = json.dumps({"terms": terms, "chunk_ids": self.chunk_ids}).encode("utf-8")
+            temp_path = self.path / "bm25.tmp.npz"
+            np.savez(
+                temp_path,
+                index=np.frombuffer(index, dtype=np.uint8),
+                offsets=offsets,
+                docs=docs,
+                frequencies=frequencies,
+                doc_lengths=np.frombuffer(self.doc_lengths, dtype=np.uint32),
+                alive=np.frombuffer(bytes(self.alive), dtype=np.uint8)
+            )
+            os.replace(temp_path, self.path / "bm25.npz")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "chunks": len(self.doc_numbers),
+                "terms": len(self.postings),
+                "postings": sum(len(docs) for docs, _ in self.postings.values()),
+                "deleted_pending_compaction": self.dead,
+                "searches": self.searches,
+                "average_search_ms": round(1000 * self.search_seconds / self.searches, 3) if self.searches else 0.0
+            }
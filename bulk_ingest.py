@@ -0,0 +1,262 @@
+"""
+Bulk corpus ingestion - load directories and archives straight into the
+persistent vector store without going through the web server.
+
+Usage:
+    python bulk_ingest.py PATH [PATH ...] [--workers N] [--embed-workers N] [--batch-chunks 2048] [--restart]
+
+PATH may be a directory (walked recursively), a .zip archive or a tar archive
+(.tar, .tar.gz, .tgz, .tar.bz2, .tar.xz). Documents are extracted and chunked
+in parallel worker processes and embedded in large cross-document batches.
+Finished documents are recorded in a state file next to the Chroma database,
+so an interrupted run picks up where it stopped when started again; a file
+whose size or modification time has changed since is ingested again.
+
+Documents are indexed under their base name, as /upload does, and synced like
+a re-upload: ingesting a changed file (in bulk or through the server) replaces
+its old chunks. Files that share a base name are therefore the same document,
+and the one ingested last wins.
+
+Stop the web server first: both processes would otherwise write to the same
+Chroma directory. The server reopens the ingested index when it starts again
+(unless INDEX_PERSISTENCE=wipe, which deletes it on startup).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterator, List, Tuple
+
+from config import settings
+from document_processor import build_chunk_metadata, process_document_in_worker
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.txt'}
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+
+def is_supported(name: str) -> bool:
+    return PurePosixPath(name).suffix.lower() in SUPPORTED_EXTENSIONS
+
+
+def iter_sources(path: Path, staging_dir: str) -> Iterator[Tuple[str, str, str, bool]]:
+    """
+    Yield (source_key, filename, file_path, is_temporary) for every supported document.
+    
+    filename is the base name, the identity /upload gives a document.
+    source_key identifies this version of the file (its location, size and
+    modification time) for resuming. Archive members are copied to
+    staging_dir one at a time as they are yielded; the caller deletes them
+    once processed.
+    """
+    if path.is_dir():
+        for file_path in sorted(path.rglob('*')):
+            if file_path.is_file() and is_supported(file_path.name):
+                stat = file_path.stat()
+                yield f"{file_path.resolve()}@{stat.st_size}:{stat.st_mtime_ns}", file_path.name, str(file_path), False
+        return
+    
+    def stage(member_name: str, source) -> str:
+        fd, staged_path = tempfile.mkstemp(dir=staging_dir, suffix=PurePosixPath(member_name).suffix.lower())
+        with os.fdopen(fd, 'wb') as staged:
+            shutil.copyfileobj(source, staged)
+        return staged_path
+    
+    archive_stat = path.stat()
+    archive_key = f"{path.resolve()}@{archive_stat.st_size}:{archive_stat.st_mtime_ns}"
+    if path.suffix.lower() == '.zip':
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                if not member.is_dir() and is_supported(member.filename):
+                    member_name = PurePosixPath(member.filename).as_posix()
+                    with archive.open(member) as source:
+                        staged_path = stage(member_name, source)
+                    yield f"{archive_key}::{member_name}", PurePosixPath(member_name).name, staged_path, True
+    elif path.name.lower().endswith(TAR_SUFFIXES):
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile() and is_supported(member.name):
+                    member_name = PurePosixPath(member.name).as_posix()
+                    staged_path = stage(member_name, archive.extractfile(member))
+                    yield f"{archive_key}::{member_name}", PurePosixPath(member_name).name, staged_path, True
+    elif path.is_file() and is_supported(path.name):
+        stat = path.stat()
+        yield f"{path.resolve()}@{stat.st_size}:{stat.st_mtime_ns}", path.name, str(path), False
+    else:
+        print(f"[WARNING] Skipping unsupported path: {path}")
+
+
+class IngestState:
+    """Append-only record of finished documents, used to resume interrupted runs."""
+    
+    def __init__(self, state_path: Path, restart: bool):
+        self.state_path = state_path
+        self.done = set()
+        if restart and state_path.exists():
+            state_path.unlink()
+        if state_path.exists():
+            with open(state_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.done.add(json.loads(line)["source"])
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(state_path, 'a', encoding='utf-8')
+    
+    def mark_done(self, sources: List[str]):
+        for source in sources:
+            self.file.write(json.dumps({"source": source}) + "\n")
+            self.done.add(source)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+    
+    def close(self):
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='Directories, .zip or tar archives, or single documents')
+    parser.add_argument('--workers', type=int, default=settings.ingest_process_workers or os.cpu_count() or 1,
+                        help='Extraction worker processes (default: INGEST_PROCESS_WORKERS or CPU count)')
+    parser.add_argument('--batch-chunks', type=int, default=2048,
+                        help='Chunks collected across documents before each embedding/write batch')
+    parser.add_argument('--state', default=os.path.join(settings.chroma_db_dir, 'bulk_ingest_state.jsonl'),
+                        help='Resume state file')
+    parser.add_argument('--restart', action='store_true', help='Ignore previous progress and start over')
+    parser.add_argument('--embed-workers', type=int, default=settings.embedding_pool_workers,
+                        help='Encoder worker processes for embedding (default: EMBEDDING_POOL_WORKERS; 0 = in-process)')
+    args = parser.parse_args()
+    settings.embedding_pool_workers = args.embed_workers
+    
+    from rag_engine import RAGEngine
+    
+    print("=" * 60)
+    print("Knowledge Base Search Engine - Bulk Ingestion")
+    print("=" * 60)
+    
+    rag_engine = RAGEngine()
+    state = IngestState(Path(args.state), args.restart)
+    if state.done:
+        print(f"Resuming: {len(state.done)} documents already ingested")
+    
+    staging_dir = tempfile.mkdtemp(prefix='bulk_ingest_')
+    max_in_flight = args.workers * 4
+    
+    stats = {"docs": 0, "chunks": 0, "new_chunks": 0, "removed_chunks": 0, "skipped": 0, "failed": 0}
+    pending_documents: List[Tuple[str, List[str], List[Dict[str, Any]]]] = []
+    pending_sources: List[str] = []
+    pending_chunk_count = 0
+    seen_filenames: Dict[str, str] = {}
+    
+    def flush():
+        nonlocal pending_chunk_count
+        if pending_documents:
+            sync_result = rag_engine.sync_documents(pending_documents)
+            if not sync_result["success"]:
+                raise RuntimeError(f"Failed to add documents: {sync_result.get('error')}")
+            stats["new_chunks"] += sync_result["num_chunks_added"]
+            stats["removed_chunks"] += sync_result["num_chunks_removed"]
+        state.mark_done(pending_sources)
+        pending_documents.clear()
+        pending_sources.clear()
+        pending_chunk_count = 0
+    
+    def collect(future, source, filename, file_path, is_temporary):
+        try:
+            result = future.result()
+        finally:
+            if is_temporary:
+                os.remove(file_path)
+        
+        if not result["success"]:
+            stats["failed"] += 1
+            print(f"[ERROR] {filename}: {result.get('error')}")
+            return
+        
+        nonlocal pending_chunk_count
+        if filename in seen_filenames:
+            print(f"[WARNING] {filename} also came from {seen_filenames[filename]}; this copy replaces it")
+            if any(pending_filename == filename for pending_filename, _, _ in pending_documents):
+                # Sync the earlier copy first so this one is diffed against it
+                flush()
+        seen_filenames[filename] = source
+        
+        pending_documents.append((filename, result["chunks"], build_chunk_metadata(filename, result)))
+        pending_sources.append(source)
+        pending_chunk_count += len(result["chunks"])
+        stats["docs"] += 1
+        stats["chunks"] += result["num_chunks"]
+        
+        if pending_chunk_count >= args.batch_chunks:
+            flush()
+            elapsed = time.perf_counter() - start
+            print(f"  {stats['docs']} docs, {stats['chunks']} chunks "
+                  f"({stats['docs'] / elapsed:.1f} docs/sec, {stats['chunks'] / elapsed:.1f} chunks/sec)")
+    
+    start = time.perf_counter()
+    in_flight = {}
+    collection_size = None
+    try:
+        # Spawn rather than fork: this process already holds the embedding model's threads
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for path in args.paths:
+                for source, filename, file_path, is_temporary in iter_sources(Path(path), staging_dir):
+                    if source in state.done:
+                        stats["skipped"] += 1
+                        if is_temporary:
+                            os.remove(file_path)
+                        continue
+                    
+                    # Collect an earlier copy of this base name first, so the copy
+                    # that comes last in the input replaces it, whatever finishes first
+                    for earlier in [done for done, queued in in_flight.items() if queued[1] == filename]:
+                        collect(earlier, *in_flight.pop(earlier))
+                    
+                    future = pool.submit(process_document_in_worker, file_path, filename)
+                    in_flight[future] = (source, filename, file_path, is_temporary)
+                    
+                    # Bound the number of staged files and queued results
+                    if len(in_flight) >= max_in_flight:
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for done in finished:
+                            collect(done, *in_flight.pop(done))
+            
+            for done in list(in_flight):
+                collect(done, *in_flight.pop(done))
+        flush()
+        collection_size = rag_engine.store.count()
+    except KeyboardInterrupt:
+        print("\nInterrupted - progress saved, run the same command again to resume.")
+        return 1
+    finally:
+        state.close()
+        rag_engine.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    
+    elapsed = time.perf_counter() - start
+    print("\n" + "=" * 60)
+    print("Bulk Ingestion Summary")
+    print("=" * 60)
+    print(f"Documents ingested:  {stats['docs']}")
+    print(f"Documents skipped:   {stats['skipped']} (already ingested)")
+    print(f"Documents failed:    {stats['failed']}")
+    print(f"Chunks:              {stats['chunks']} ({stats['new_chunks']} new, "
+          f"{stats['chunks'] - stats['new_chunks']} already indexed, {stats['removed_chunks']} stale removed)")
+    print(f"Elapsed:             {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput:          {stats['docs'] / elapsed:.2f} docs/sec, "
+              f"{stats['chunks'] / elapsed:.1f} chunks/sec")
+    print(f"Collection size:     {collection_size}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
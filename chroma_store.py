@@ -0,0 +1,209 @@
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+
+from vector_store import VectorStore
+
+CHROMA_VERSION = tuple(int(part) for part in chromadb.__version__.split('.')[:2])
+# Chroma accepts NumPy embeddings from 0.5; older releases validate for nested lists
+CHROMA_ACCEPTS_NUMPY = CHROMA_VERSION >= (0, 5)
+# Setting search ef goes through Chroma internals (the segment's hnswlib index),
+# which have only been checked against these releases
+CHROMA_HNSW_INTERNALS = (0, 4) <= CHROMA_VERSION < (0, 6)
+
+
+def to_store_embeddings(embeddings: np.ndarray):
+    """Hand embeddings to Chroma, converting to lists only if this Chroma version requires it."""
+    if CHROMA_ACCEPTS_NUMPY:
+        return embeddings
+    return embeddings.tolist()
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    Persistent Chroma collection with a cosine HNSW index.
+    
+    M and construction_ef shape the graph and only apply when the collection
+    is created. search_ef is recorded at creation too, and Chroma offers no
+    way to change it afterwards or per query. So when the configured
+    search_ef differs from the recorded one, it is set on the collection's
+    live hnswlib index before the first query, and a query with its own
+    search_ef sets it for the duration of that call and then restores the
+    configured one. Both reach into Chroma internals and are skipped, with
+    a warning, on untested Chroma versions; applies_search_ef() then
+    returns False.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        index_metadata: Dict[str, Any],
+        hnsw_m: int = 16,
+        hnsw_construction_ef: int = 100,
+        hnsw_search_ef: int = 10
+    ):
+        super().__init__(index_metadata)
+        self.hnsw_params = {
+            "hnsw:M": hnsw_m,
+            "hnsw:construction_ef": hnsw_construction_ef,
+            "hnsw:search_ef": hnsw_search_ef
+        }
+        self.search_ef = hnsw_search_ef
+        self.ef_lock = threading.Lock()
+        self.ef_override_supported = True
+        self.client = chromadb.PersistentClient(
+            path=path,
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+        try:
+            self.collection = self.client.get_collection(name=self.name)
+            stored = {key: self.metadata[key] for key in ("hnsw:M", "hnsw:construction_ef") if key in self.metadata}
+            if stored and stored != {key: self.hnsw_params[key] for key in stored}:
+                print(f"[WARNING] Existing collection keeps its HNSW parameters {stored}; "
+                      "clear and re-ingest to apply the configured ones")
+        except Exception:
+            self.collection = self._create_collection()
+        # The ef the live index searches with, until it is set to search_ef
+        self.live_ef = self.metadata.get("hnsw:search_ef", 10)
+    
+    def _create_collection(self):
+        return self.client.create_collection(
+            name=self.name,
+            metadata={"hnsw:space": "cosine", **self.hnsw_params, **self.index_metadata}
+        )
+    
+    def _hnsw_index(self):
+        """The collection's live hnswlib index, reached through Chroma internals (None if unavailable)."""
+        if not CHROMA_HNSW_INTERNALS:
+            return None
+        try:
+            from chromadb.segment import VectorReader
+            segment = self.client._server._manager.get_segment(self.collection.id, VectorReader)
+            return segment._index
+        except Exception:
+            return None
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.collection.metadata or {}
+    
+    def vector_dim(self) -> Optional[int]:
+        if self.collection.count() == 0:
+            return None
+        return len(self.collection.peek(limit=1)["embeddings"][0])
+    
+    def count(self) -> int:
+        return self.collection.count()
+    
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+    
+    def ids_for_source(self, filename: str) -> List[str]:
+        return self.collection.get(where={"filename": filename}, include=[])["ids"]
+    
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]):
+        self.collection.add(
+            ids=ids,
+            embeddings=to_store_embeddings(embeddings),
+            documents=documents,
+            metadatas=metadatas
+        )
+    
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        self.collection.update(ids=ids, metadatas=metadatas)
+    
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+    
+    def query(self, embeddings: np.ndarray, top_k: int, search_ef: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        count = self.collection.count()
+        if count == 0:
+            return [[] for _ in range(len(embeddings))]
+        if search_ef and search_ef != self.search_ef:
+            results = self._query_with_ef(embeddings, min(top_k, count), search_ef)
+        else:
+            if self.live_ef != self.search_ef and self.ef_override_supported:
+                self._apply_search_ef()
+            results = self.collection.query(
+                query_embeddings=to_store_embeddings(embeddings),
+                n_results=min(top_k, count)
+            )
+        return [
+            [
+                # Cosine distance -> similarity
+                {"id": chunk_id, "text": doc, "metadata": meta, "similarity": 1 - dist}
+                for chunk_id, doc, meta, dist in zip(ids, documents, metadatas, distances)
+            ]
+            for ids, documents, metadatas, distances in zip(
+                results["ids"], results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+    
+    def _live_index(self):
+        """The live hnswlib index, or None (warning once) if it cannot be reached."""
+        index = self._hnsw_index()
+        if index is None and self.ef_override_supported:
+            print(f"[WARNING] Cannot reach the HNSW index of Chroma {chromadb.__version__}; "
+                  "ignoring per-query ef and a changed HNSW_SEARCH_EF")
+            self.ef_override_supported = False
+        return index
+    
+    def _apply_search_ef(self):
+        with self.ef_lock:
+            index = self._live_index()
+            if index is not None:
+                index.set_ef(self.search_ef)
+                self.live_ef = self.search_ef
+    
+    def _query_with_ef(self, embeddings: np.ndarray, n_results: int, search_ef: int):
+        # ef is a property of the shared index, so overriding queries run one at a time.
+        # A default query that overlaps one of them may search with the override; its
+        # results are still valid, just more (or less) thorough.
+        with self.ef_lock:
+            index = self._live_index()
+            if index is not None:
+                index.set_ef(search_ef)
+            try:
+                return self.collection.query(
+                    query_embeddings=to_store_embeddings(embeddings),
+                    n_results=n_results
+                )
+            finally:
+                if index is not None:
+                    index.set_ef(self.search_ef)
+                    self.live_ef = self.search_ef
+    
+    def applies_search_ef(self) -> bool:
+        return self.ef_override_supported
+    
+    def fetch(self, ids: List[str], include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        found = self.collection.get(ids=ids, include=include)
+        records = {
+            chunk_id: {"id": chunk_id, "text": doc, "metadata": meta}
+            for chunk_id, doc, meta in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        if include_embeddings:
+            for chunk_id, embedding in zip(found["ids"], found["embeddings"]):
+                records[chunk_id]["embedding"] = np.asarray(embedding, dtype=np.float32)
+        return [records[chunk_id] for chunk_id in ids if chunk_id in records]
+    
+    def iter_entries(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], List[str], np.ndarray]]:
+        total = self.collection.count()
+        for offset in range(0, total, batch_size):
+            batch = self.collection.get(limit=batch_size, offset=offset, include=["documents", "embeddings"])
+            yield batch["ids"], batch["documents"], np.asarray(batch["embeddings"], dtype=np.float32)
+    
+    def iter_documents(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], List[str]]]:
+        total = self.collection.count()
+        for offset in range(0, total, batch_size):
+            batch = self.collection.get(limit=batch_size, offset=offset, include=["documents"])
+            yield batch["ids"], batch["documents"]
+    
+    def clear(self):
+        self.client.delete_collection(self.name)
+        self.collection = self._create_collection()
+        self.live_ef = self.search_ef
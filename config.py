@@ -12,23 +12,91 @@ class Settings(BaseSettings):
     
     # Embedding Configuration
     embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_batch_size: int = 64  # Chunks per encoder call (and Chroma write) during ingestion
+    embedding_backend: str = "torch"  # "torch" (Sentence Transformers) or "onnx" (ONNX Runtime, CPU)
+    onnx_quantize: bool = True  # Use the int8 dynamically quantized ONNX model
+    onnx_num_threads: int = 0  # ONNX Runtime intra-op threads; 0 uses all cores
+    onnx_model_dir: str = "onnx_models"  # Where exported ONNX models are cached
+    embedding_pool_workers: int = 0  # Encoder worker processes for ingestion embedding; 0 embeds in-process
+    embedding_pool_threads: int = 1  # Intra-op threads per encoder worker
+    embedding_cache_max_mb: int = 1024  # Persistent cache of chunk embeddings by content hash; 0 disables
+    embedding_reduction: str = "none"  # "none", "pca" (fitted projection) or "truncate" (Matryoshka models)
+    embedding_reduced_dim: int = 128  # Stored vector size when a reduction is enabled
     
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
     
     # Document Processing
-    chunk_size: int = 1000
+    chunking_strategy: str = "tokens"  # "tokens" (embedding tokenizer) or "characters"
+    chunk_max_tokens: int = 256  # all-MiniLM-L6-v2 truncates input at 256 word-pieces
+    chunk_overlap_tokens: int = 32
+    chunk_size: int = 1000  # Used by the "characters" strategy
     chunk_overlap: int = 200
     max_file_size_mb: int = 10
+    max_upload_total_mb: int = 100  # Per /upload request, across all files; 0 = no limit
+    max_upload_files: int = 20  # Files per /upload request; 0 = no limit
+    extraction_cache_max_mb: int = 512  # Cache of cleaned text keyed by file hash; 0 disables
+    ingest_process_workers: Optional[int] = None  # None = one per CPU core, 1 = no pool
+    
+    # Background Ingest Jobs
+    ingest_queue_size: int = 16  # Uploads beyond this many queued jobs get HTTP 429
+    ingest_job_workers: int = 1
+    ingest_job_history: int = 100
+    
+    # Request Executors (blocking work is kept off the event loop)
+    ingest_thread_workers: int = 2
+    query_thread_workers: int = 8
+    
+    # Query Embedding Micro-Batching
+    query_batch_wait_ms: float = 2.0  # How long to gather concurrent queries before encoding
+    query_batch_max_size: int = 32
+    query_embedding_cache_size: int = 1024  # LRU entries for repeated queries; 0 disables
+    
+    # Batch Queries (/query/batch)
+    batch_query_max_questions: int = 256
+    batch_query_llm_concurrency: int = 4  # Answers synthesized at once across all batch requests
+    
+    # Vector Store
+    vector_store: str = "chroma"  # "chroma" (HNSW), "numpy" (exact brute force, small corpora) or "faiss" (IVF-PQ, huge corpora)
+    hnsw_m: int = 16  # HNSW graph degree (chroma): higher improves recall, costs memory and build time
+    hnsw_construction_ef: int = 100  # Candidate list size while building the HNSW graph (chroma)
+    hnsw_search_ef: int = 10  # Candidate list size per query (chroma); /query can override it per request
+    faiss_nlist: int = 1024  # IVF clusters; roughly sqrt(number of chunks) to 4x that
+    faiss_pq_m: int = 16  # PQ sub-vectors (bytes per vector at 8 bits); must divide the vector dimension
+    faiss_pq_bits: int = 8
+    faiss_nprobe: int = 16  # Clusters scanned per query: higher is slower but more accurate
+    faiss_train_size: int = 50000  # Vectors buffered (and searched exactly) before the index is trained
     
     # Retrieval Configuration
     top_k_results: int = 5
     similarity_threshold: float = 0.0
     
+    # Hybrid Retrieval (BM25 + vector, fused with reciprocal rank fusion)
+    hybrid_lexical_weight: float = 0.0  # Share of the fused score from BM25 ranks; 0 (default) disables the BM25 index
+    hybrid_candidates: int = 20  # Candidates taken from each retriever before fusion
+    hybrid_rrf_k: int = 60  # RRF constant: larger values flatten the difference between ranks
+    
+    # Reranking (cross-encoder over a larger candidate set, CPU)
+    rerank_enabled: bool = False
+    rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_candidates: int = 30  # Chunks retrieved (after fusion) and scored by the cross-encoder
+    rerank_top_n: int = 4  # Best chunks passed to the LLM; a request's top_k overrides it
+    rerank_batch_size: int = 16  # (query, chunk) pairs per cross-encoder call
+    rerank_max_latency_ms: float = 250.0  # Stop scoring further batches past this budget; 0 = no cap
+    
+    # Index Persistence
+    index_persistence: str = "persist"  # "persist" reopens the existing index on startup; "wipe" deletes it and all uploads
+    
     # Storage Paths
     upload_dir: str = "uploaded_documents"
     chroma_db_dir: str = "chroma_db"
+    extraction_cache_dir: str = "extraction_cache"
+    embedding_cache_dir: str = "embedding_cache"
+    numpy_store_dir: Optional[str] = None  # Defaults to <chroma_db_dir>/numpy_store
+    faiss_index_dir: Optional[str] = None  # Defaults to <chroma_db_dir>/faiss_ivfpq
+    bm25_index_dir: Optional[str] = None  # Defaults to <chroma_db_dir>/bm25
+    pca_path: Optional[str] = None  # Defaults to <chroma_db_dir>/embedding_pca.npz; written by `python dim_reduction.py fit`
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,159 @@
+"""
+Dimensionality reduction for stored embeddings.
+
+Usage:
+    python dim_reduction.py fit [FILE_OR_DIR ...] [--dim 128] [--samples 20000]
+
+Fits a PCA projection on chunk embeddings of the given documents and saves
+it to PCA_PATH (by default embedding_pca.npz in the index directory), for use
+with EMBEDDING_REDUCTION=pca.
+"""
+import argparse
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class EmbeddingReducer:
+    """
+    Maps full-size model embeddings to the smaller vectors stored in the index.
+    
+    "pca" projects onto the top principal components of a fitted sample;
+    "truncate" keeps the leading dimensions, which is only meaningful for
+    Matryoshka-trained models. Both re-normalize, so cosine scores stay
+    comparable. The same reducer has to be applied to chunks and queries;
+    describe() is recorded in the collection metadata to enforce that.
+    """
+    
+    def __init__(self, method: str, dim: int, mean: Optional[np.ndarray] = None, components: Optional[np.ndarray] = None):
+        if method not in ("pca", "truncate"):
+            raise ValueError(f"Unsupported embedding reduction: {method}")
+        self.method = method
+        self.dim = dim
+        self.mean = mean
+        # Stored transposed so transform is a single (n, full) @ (full, dim) product
+        self.projection = np.ascontiguousarray(components.T, dtype=np.float32) if components is not None else None
+    
+    @classmethod
+    def fit_pca(cls, embeddings: np.ndarray, dim: int) -> "EmbeddingReducer":
+        """Fit a PCA projection to dim components on a sample of full-size embeddings."""
+        if dim >= embeddings.shape[1]:
+            raise ValueError(f"Reduced dimension {dim} must be smaller than {embeddings.shape[1]}")
+        if len(embeddings) < dim:
+            raise ValueError(f"Need at least {dim} embeddings to fit {dim} components, got {len(embeddings)}")
+        embeddings = embeddings.astype(np.float32)
+        mean = embeddings.mean(axis=0)
+        _, _, vt = np.linalg.svd(embeddings - mean, full_matrices=False)
+        return cls("pca", dim, mean=mean, components=vt[:dim])
+    
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingReducer":
+        data = np.load(path)
+        return cls("pca", int(data["components"].shape[0]), mean=data["mean"], components=data["components"])
+    
+    def save(self, path: str):
+        np.savez(path, mean=self.mean, components=self.projection.T)
+    
+    def describe(self) -> str:
+        """Identifies the reduction, including a fingerprint of fitted PCA weights."""
+        if self.method == "truncate":
+            return f"truncate-{self.dim}"
+        fingerprint = hashlib.sha256(self.mean.tobytes() + self.projection.tobytes()).hexdigest()[:12]
+        return f"pca-{self.dim}-{fingerprint}"
+    
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        if self.method == "truncate":
+            reduced = embeddings[..., :self.dim]
+        else:
+            reduced = (embeddings - self.mean) @ self.projection
+        norms = np.linalg.norm(reduced, axis=-1, keepdims=True)
+        return np.ascontiguousarray(reduced / np.clip(norms, 1e-12, None), dtype=np.float32)
+
+
+def pca_path() -> str:
+    """Where the fitted PCA projection lives: PCA_PATH, or inside the index directory."""
+    from config import settings
+    
+    return settings.pca_path or os.path.join(settings.chroma_db_dir, "embedding_pca.npz")
+
+
+def load_reducer(full_dim: int) -> Optional[EmbeddingReducer]:
+    """The reducer configured by EMBEDDING_REDUCTION, or None."""
+    from config import settings
+    
+    method = settings.embedding_reduction.lower()
+    if method == "none":
+        return None
+    if method == "truncate":
+        if settings.embedding_reduced_dim >= full_dim:
+            raise ValueError(f"EMBEDDING_REDUCED_DIM must be smaller than the model dimension ({full_dim})")
+        return EmbeddingReducer("truncate", settings.embedding_reduced_dim)
+    if method == "pca":
+        path = pca_path()
+        if not Path(path).exists():
+            raise ValueError(
+                f"EMBEDDING_REDUCTION=pca but {path} does not exist; "
+                f"fit it first with: python dim_reduction.py fit <documents>"
+            )
+        reducer = EmbeddingReducer.load(path)
+        if reducer.mean.shape[0] != full_dim:
+            raise ValueError(f"{path} was fitted on {reducer.mean.shape[0]}-dim embeddings, model has {full_dim}")
+        if reducer.dim != settings.embedding_reduced_dim:
+            raise ValueError(
+                f"{path} projects to {reducer.dim} dimensions, but EMBEDDING_REDUCED_DIM={settings.embedding_reduced_dim}; "
+                f"set it to {reducer.dim} or re-fit with --dim {settings.embedding_reduced_dim}"
+            )
+        return reducer
+    raise ValueError(f"Unsupported EMBEDDING_REDUCTION: {settings.embedding_reduction} (use none, pca or truncate)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['fit'])
+    parser.add_argument('paths', nargs='*', default=['sample_documents'])
+    parser.add_argument('--dim', type=int, default=None, help='Components to keep (default: EMBEDDING_REDUCED_DIM)')
+    parser.add_argument('--samples', type=int, default=20000, help='Maximum chunks to fit on')
+    args = parser.parse_args()
+    
+    from config import settings
+    from document_processor import DocumentProcessor
+    from embedding_backends import load_embedding_model
+    
+    dim = args.dim or settings.embedding_reduced_dim
+    processor = DocumentProcessor()
+    chunks = []
+    for path in map(Path, args.paths):
+        files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+        for file_path in files:
+            if file_path.suffix.lower() not in ('.pdf', '.docx', '.txt'):
+                continue
+            result = processor.process_document(str(file_path), file_path.name)
+            if result["success"]:
+                chunks.extend(result["chunks"])
+    if len(chunks) > args.samples:
+        rng = np.random.default_rng(0)
+        chunks = [chunks[i] for i in rng.choice(len(chunks), args.samples, replace=False)]
+    
+    print(f"Embedding {len(chunks)} chunks with {settings.embedding_model}")
+    model = load_embedding_model()
+    embeddings = np.asarray(model.encode(chunks, batch_size=settings.embedding_batch_size, convert_to_numpy=True))
+    reducer = EmbeddingReducer.fit_pca(embeddings, dim)
+    path = pca_path()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    reducer.save(path)
+    
+    _, singular_values, _ = np.linalg.svd(embeddings - embeddings.mean(axis=0), full_matrices=False)
+    variance = singular_values ** 2
+    print(f"Saved {reducer.describe()} to {path} "
+          f"({variance[:dim].sum() / variance.sum():.1%} of variance retained)")
+    if dim != settings.embedding_reduced_dim:
+        print(f"[WARNING] Set EMBEDDING_REDUCED_DIM={dim} to use this projection")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
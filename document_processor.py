@@ -1,6 +1,8 @@
 import os
 import re
-from typing import List, Dict, Any
+from bisect import bisect_right
+from collections import deque
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import PyPDF2
 try:
     import fitz  # PyMuPDF (optional)
@@ -9,41 +11,111 @@ except ImportError:
     HAS_PYMUPDF = False
     print("PyMuPDF not available, using PyPDF2 for PDF processing")
 from docx import Document as DocxDocument
+try:
+    from transformers import AutoTokenizer  # Installed with sentence-transformers
+    HAS_TRANSFORMERS = True
+except ImportError:
+    HAS_TRANSFORMERS = False
+    print("transformers not available, using character-based chunking")
 from pathlib import Path
 from config import settings
+from extraction_cache import ExtractionCache
+
+
+# Whitespace that follows sentence-ending punctuation
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Sentences passed to the tokenizer per call when chunking by tokens
+TOKENIZE_BATCH_SIZE = 64
+
+# Characters per token budget after which text without sentence punctuation is
+# cut at a space instead of being carried into the next page
+MAX_CHARS_PER_TOKEN = 8
+
+
+def embedding_model_repo(model_name: str) -> str:
+    """Hugging Face repo (or local path) for a Sentence Transformers model name."""
+    if '/' in model_name or os.path.isdir(model_name):
+        return model_name
+    return f"sentence-transformers/{model_name}"
+
+
+def check_chunk_overlap(chunk_size: int, overlap: int, unit: str):
+    """Refuse an overlap that leaves no room to advance: it would emit near-duplicate chunks."""
+    if overlap >= chunk_size:
+        raise ValueError(f"Chunk overlap ({overlap} {unit}) must be smaller than the chunk size ({chunk_size} {unit})")
 
 
 class DocumentProcessor:
     """Handles document ingestion and text extraction."""
     
     def __init__(self):
+        # Fail at startup rather than on the first upload
+        if settings.chunking_strategy == "tokens":
+            check_chunk_overlap(settings.chunk_max_tokens - 2, settings.chunk_overlap_tokens, "tokens")
+        else:
+            check_chunk_overlap(settings.chunk_size, settings.chunk_overlap, "characters")
         self.upload_dir = Path(settings.upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
+        self._tokenizer = None
+        self.extraction_cache = None
+        if settings.extraction_cache_max_mb > 0:
+            self.extraction_cache = ExtractionCache(
+                settings.extraction_cache_dir,
+                max_bytes=settings.extraction_cache_max_mb * 1024 * 1024
+            )
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF using PyMuPDF if available, otherwise PyPDF2."""
+    def iter_pdf_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page_number, text) for each PDF page using PyMuPDF if available, otherwise PyPDF2.
+        
+        A page PyMuPDF fails to extract is retried with PyPDF2; a page neither
+        can read is skipped with a warning rather than failing the document.
+        """
         # Try PyMuPDF first (if available)
         if HAS_PYMUPDF:
+            doc = None
             try:
-                text = ""
                 doc = fitz.open(file_path)
-                for page in doc:
-                    text += page.get_text()
-                doc.close()
-                return text.strip()
             except Exception as e:
                 print(f"PyMuPDF failed, falling back to PyPDF2: {e}")
+            if doc is not None:
+                fallback = None
+                try:
+                    for page_number in range(1, doc.page_count + 1):
+                        try:
+                            text = doc.load_page(page_number - 1).get_text()
+                        except Exception as e:
+                            print(f"PyMuPDF failed on page {page_number}, falling back to PyPDF2: {e}")
+                            try:
+                                if fallback is None:
+                                    fallback = PyPDF2.PdfReader(file_path)
+                                text = fallback.pages[page_number - 1].extract_text() or ""
+                            except Exception as e2:
+                                print(f"[WARNING] Skipping unreadable page {page_number} of {file_path}: {e2}")
+                                continue
+                        yield page_number, text
+                finally:
+                    doc.close()
+                return
         
         # Use PyPDF2 as fallback or primary method
-        try:
-            text = ""
-            with open(file_path, 'rb') as file:
+        with open(file_path, 'rb') as file:
+            try:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-            return text.strip()
-        except Exception as e2:
-            raise Exception(f"Failed to extract PDF text: {str(e2)}")
+            except Exception as e2:
+                raise Exception(f"Failed to extract PDF text: {str(e2)}")
+            for page_number in range(1, len(pdf_reader.pages) + 1):
+                try:
+                    text = pdf_reader.pages[page_number - 1].extract_text() or ""
+                except Exception as e:
+                    print(f"[WARNING] Skipping unreadable page {page_number} of {file_path}: {e}")
+                    continue
+                yield page_number, text
+    
+    def extract_text_from_pdf(self, file_path: str) -> str:
+        """Extract text from PDF using PyMuPDF if available, otherwise PyPDF2."""
+        return "".join(text for _, text in self.iter_pdf_pages(file_path)).strip()
     
     def extract_text_from_docx(self, file_path: str) -> str:
         """Extract text from DOCX files."""
@@ -77,6 +149,15 @@ class DocumentProcessor:
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
     
+    def iter_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) pairs. Non-paginated formats are a single page."""
+        file_extension = Path(file_path).suffix.lower()
+        
+        if file_extension == '.pdf':
+            yield from self.iter_pdf_pages(file_path)
+        else:
+            yield 1, self.extract_text(file_path)
+    
     def clean_text(self, text: str) -> str:
         """Clean and normalize extracted text."""
         # Remove excessive whitespace
@@ -85,61 +166,277 @@ class DocumentProcessor:
         text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
         return text.strip()
     
-    def chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
-        """Split text into overlapping chunks."""
+    def clean_pages(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """Clean pages one at a time, dropping pages with no text."""
+        for page_number, text in pages:
+            cleaned = self.clean_text(text)
+            if cleaned:
+                yield page_number, cleaned
+    
+    def chunk_pages(
+        self,
+        pages: Iterable[Tuple[int, str]],
+        chunk_size: int = None,
+        overlap: int = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Split a stream of cleaned pages into overlapping chunks.
+        
+        Only the text not yet emitted (plus the overlap) is buffered, so memory
+        stays bounded by a few pages regardless of document length. Each chunk
+        carries the first and last page it spans.
+        """
         chunk_size = chunk_size or settings.chunk_size
         overlap = overlap or settings.chunk_overlap
+        check_chunk_overlap(chunk_size, overlap, "characters")
         
-        if len(text) <= chunk_size:
-            return [text]
+        buffer = ""
+        buffer_offset = 0  # Absolute offset of buffer[0] in the joined text
+        page_starts: List[int] = []  # Absolute offset where each buffered page begins
+        page_numbers: List[int] = []
+        start = 0  # Absolute offset of the next chunk
         
-        chunks = []
-        start = 0
+        def page_at(offset: int) -> int:
+            return page_numbers[max(bisect_right(page_starts, offset) - 1, 0)]
         
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
+        def take_chunks(final: bool) -> Iterator[Dict[str, Any]]:
+            nonlocal start
+            text_end = buffer_offset + len(buffer)
+            # Without more input we only know a chunk is not the last one once
+            # the buffer extends past its window
+            while start < text_end and (final or start + chunk_size < text_end):
+                end = start + chunk_size
+                chunk = buffer[start - buffer_offset:end - buffer_offset]
+                
+                # Try to break at sentence or word boundary
+                if end < text_end:
+                    # Look for sentence end
+                    last_period = chunk.rfind('.')
+                    last_newline = chunk.rfind('\n')
+                    last_boundary = max(last_period, last_newline)
+                    
+                    if last_boundary > chunk_size * 0.5:  # At least 50% of chunk
+                        end = start + last_boundary + 1
+                        chunk = chunk[:last_boundary + 1]
+                    else:
+                        # Look for word boundary
+                        last_space = chunk.rfind(' ')
+                        if last_space > chunk_size * 0.5:
+                            end = start + last_space
+                            chunk = chunk[:last_space]
+                
+                end = min(end, text_end)
+                chunk = chunk.strip()
+                if chunk:
+                    yield {
+                        "text": chunk,
+                        "page_start": page_at(start),
+                        "page_end": page_at(end - 1)
+                    }
+                
+                if end >= text_end:
+                    start = text_end
+                    break
+                start = max(end - overlap, start + 1)
+        
+        for page_number, text in pages:
+            if buffer:
+                buffer += ' '
+            page_starts.append(buffer_offset + len(buffer))
+            page_numbers.append(page_number)
+            buffer += text
+            
+            yield from take_chunks(final=False)
+            
+            # Drop everything before the next chunk start
+            if start > buffer_offset:
+                buffer = buffer[start - buffer_offset:]
+                buffer_offset = start
+                keep = max(bisect_right(page_starts, start) - 1, 0)
+                del page_starts[:keep]
+                del page_numbers[:keep]
+        
+        yield from take_chunks(final=True)
+    
+    @property
+    def tokenizer(self):
+        """The embedding model's tokenizer, loaded on first use."""
+        if self._tokenizer is None:
+            self._tokenizer = AutoTokenizer.from_pretrained(
+                embedding_model_repo(settings.embedding_model)
+            )
+        return self._tokenizer
+    
+    def iter_sentences(
+        self,
+        pages: Iterable[Tuple[int, str]],
+        max_chars: int = None
+    ) -> Iterator[Tuple[str, int]]:
+        """
+        Split a stream of cleaned pages into (sentence, page_number) pairs.
+        
+        The unfinished sentence at the end of a page is carried into the next.
+        With max_chars, a carry longer than that (text without sentence
+        punctuation) is cut at the last space before the limit, so each page
+        is split in time proportional to its own length.
+        """
+        carry = ""
+        carry_page = None
+        for page_number, text in pages:
+            if carry:
+                text = carry + ' ' + text
+            parts = SENTENCE_BOUNDARY.split(text)
+            
+            # The last part may continue on the next page
+            for i, part in enumerate(parts[:-1]):
+                yield part, (carry_page if i == 0 and carry else page_number)
+            if len(parts) > 1 or not carry:
+                carry_page = page_number
+            carry = parts[-1]
             
-            # Try to break at sentence or word boundary
-            if end < len(text):
-                # Look for sentence end
-                last_period = chunk.rfind('.')
-                last_newline = chunk.rfind('\n')
-                last_boundary = max(last_period, last_newline)
+            while max_chars and len(carry) > max_chars:
+                cut = carry.rfind(' ', 0, max_chars + 1)
+                if cut <= 0:
+                    cut = max_chars
+                yield carry[:cut], carry_page
+                carry = carry[cut:].lstrip()
+                carry_page = page_number
+        
+        if carry:
+            yield carry, carry_page
+    
+    def chunk_pages_by_tokens(
+        self,
+        pages: Iterable[Tuple[int, str]],
+        max_tokens: int = None,
+        overlap_tokens: int = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Split a stream of cleaned pages into chunks that fit the embedding model.
+        
+        Chunks are packed from whole sentences measured with the model's own
+        tokenizer, so nothing past its max sequence length is silently
+        truncated. Each sentence is tokenized once and enters and leaves the
+        window once, keeping the pass linear. Sentences longer than a chunk are
+        split on token boundaries, and text with no sentence punctuation is cut
+        at a space every MAX_CHARS_PER_TOKEN characters per budget token.
+        Overlap is the trailing sentences of the previous chunk, up to
+        overlap_tokens.
+        """
+        max_tokens = max_tokens or settings.chunk_max_tokens
+        overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+        budget = max_tokens - 2  # Room for the [CLS]/[SEP] special tokens
+        check_chunk_overlap(budget, overlap_tokens, "tokens")
+        step = budget - overlap_tokens
+        tokenizer = self.tokenizer
+        
+        def measure(batch: List[Tuple[str, int]]) -> Iterator[Tuple[str, int, int]]:
+            """Attach token counts to sentences, splitting any that exceed the budget."""
+            token_ids = tokenizer([sentence for sentence, _ in batch], add_special_tokens=False)["input_ids"]
+            for (sentence, page_number), ids in zip(batch, token_ids):
+                if len(ids) <= budget:
+                    yield sentence, len(ids), page_number
+                    continue
                 
-                if last_boundary > chunk_size * 0.5:  # At least 50% of chunk
-                    end = start + last_boundary + 1
-                    chunk = text[start:end]
-                else:
-                    # Look for word boundary
-                    last_space = chunk.rfind(' ')
-                    if last_space > chunk_size * 0.5:
-                        end = start + last_space
-                        chunk = text[start:end]
+                offsets = tokenizer(
+                    sentence, add_special_tokens=False, return_offsets_mapping=True
+                )["offset_mapping"]
+                for start in range(0, len(offsets), step):
+                    piece = offsets[start:start + budget]
+                    yield sentence[piece[0][0]:piece[-1][1]], len(piece), page_number
+                    if start + budget >= len(offsets):
+                        break
+        
+        def measured(sentences: Iterable[Tuple[str, int]]) -> Iterator[Tuple[str, int, int]]:
+            """Tokenize sentences in small batches to amortize tokenizer calls."""
+            batch = []
+            for item in sentences:
+                batch.append(item)
+                if len(batch) == TOKENIZE_BATCH_SIZE:
+                    yield from measure(batch)
+                    batch = []
+            if batch:
+                yield from measure(batch)
+        
+        window = deque()  # (sentence, num_tokens, page_number)
+        window_tokens = 0
+        has_new = False  # Whether the window holds sentences not yet emitted
+        
+        def emit() -> Dict[str, Any]:
+            return {
+                "text": ' '.join(sentence for sentence, _, _ in window),
+                "page_start": window[0][2],
+                "page_end": window[-1][2]
+            }
+        
+        sentences = self.iter_sentences(pages, max_chars=budget * MAX_CHARS_PER_TOKEN)
+        for sentence, num_tokens, page_number in measured(sentences):
+            if window and window_tokens + num_tokens > budget:
+                if has_new:
+                    yield emit()
+                    has_new = False
+                # Keep only the overlap that still leaves room for this sentence
+                while window and (window_tokens > overlap_tokens or window_tokens + num_tokens > budget):
+                    window_tokens -= window.popleft()[1]
             
-            chunks.append(chunk.strip())
-            start = end - overlap
+            window.append((sentence, num_tokens, page_number))
+            window_tokens += num_tokens
+            has_new = True
+        
+        if has_new:
+            yield emit()
+    
+    def chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
+        """Split text into overlapping chunks."""
+        if len(text) <= (chunk_size or settings.chunk_size):
+            return [text]
+        return [chunk["text"] for chunk in self.chunk_pages([(1, text)], chunk_size, overlap)]
+    
+    def cleaned_pages(self, file_path: str) -> Tuple[Iterator[Tuple[int, str]], bool]:
+        """
+        Stream a document's cleaned pages, from the extraction cache when possible.
         
-        return chunks
+        Returns the page stream and whether it came from the cache. On a miss
+        the pages are written to the cache as they are consumed.
+        """
+        if self.extraction_cache is None:
+            return self.clean_pages(self.iter_pages(file_path)), False
+        
+        key = self.extraction_cache.file_key(file_path)
+        cached = self.extraction_cache.load(key)
+        if cached is not None:
+            return cached, True
+        return self.extraction_cache.store(key, self.clean_pages(self.iter_pages(file_path))), False
     
     def process_document(self, file_path: str, filename: str) -> Dict[str, Any]:
-        """Process a document: extract text, clean, and chunk."""
+        """Process a document: stream pages through extraction, cleaning and chunking."""
         try:
-            # Extract text
-            raw_text = self.extract_text(file_path)
+            pages, cache_hit = self.cleaned_pages(file_path)
+            
+            if settings.chunking_strategy == "tokens" and HAS_TRANSFORMERS:
+                chunk_stream = self.chunk_pages_by_tokens(pages)
+            else:
+                chunk_stream = self.chunk_pages(pages)
             
-            # Clean text
-            cleaned_text = self.clean_text(raw_text)
+            chunks = []
+            chunk_metadata = []
+            for chunk in chunk_stream:
+                chunks.append(chunk["text"])
+                chunk_metadata.append({
+                    "page_start": chunk["page_start"],
+                    "page_end": chunk["page_end"]
+                })
             
-            # Chunk text
-            chunks = self.chunk_text(cleaned_text)
+            if not chunks:
+                raise ValueError("No text could be extracted from the document")
             
             return {
                 "filename": filename,
                 "file_path": file_path,
-                "text": cleaned_text,
                 "chunks": chunks,
+                "chunk_metadata": chunk_metadata,
                 "num_chunks": len(chunks),
+                "extraction_cache_hit": cache_hit,
                 "success": True
             }
         except Exception as e:
@@ -149,3 +446,28 @@ class DocumentProcessor:
                 "error": str(e),
                 "success": False
             }
+
+
+def build_chunk_metadata(filename: str, process_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Vector store metadata for each chunk of a processed document."""
+    total_chunks = process_result["num_chunks"]
+    return [
+        {
+            "filename": filename,
+            "chunk_index": i,
+            "total_chunks": total_chunks,
+            **pages
+        }
+        for i, pages in enumerate(process_result["chunk_metadata"])
+    ]
+
+
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def process_document_in_worker(file_path: str, filename: str) -> Dict[str, Any]:
+    """Process a document inside a pool worker, reusing one processor per process."""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor()
+    return _worker_processor.process_document(file_path, filename)
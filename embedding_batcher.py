@@ -0,0 +1,76 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched encoder calls.
+    
+    Callers block in embed() while a dispatcher thread gathers requests for up
+    to max_wait_ms after the first one arrives (or until max_batch_size is
+    reached), encodes them in one forward pass and hands each caller its own
+    vector. Under low load a request waits at most max_wait_ms extra.
+    """
+    
+    def __init__(self, encode_fn: Callable[[List[str]], Any], max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests: "queue.Queue[tuple]" = queue.Queue()
+        self.batches = 0
+        self.requests_served = 0
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+    
+    def embed(self, text: str):
+        """Embed one text, sharing an encoder call with concurrent callers."""
+        future: Future = Future()
+        self.requests.put((text, future))
+        return future.result()
+    
+    def embed_many(self, texts: List[str]) -> List[Any]:
+        """Embed several texts, queued together so they share encoder calls with each other and concurrent callers."""
+        futures = []
+        for text in texts:
+            future: Future = Future()
+            self.requests.put((text, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+    
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self.requests.get(timeout=remaining))
+                    else:
+                        # Window closed; still take anything already waiting
+                        batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.encode_fn(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            self.batches += 1
+            self.requests_served += len(batch)
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+    
+    def get_stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests_served,
+            "avg_batch_size": round(self.requests_served / self.batches, 2) if self.batches else 0.0
+        }
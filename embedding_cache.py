@@ -0,0 +1,296 @@
+"""
+Persistent on-disk cache of chunk embeddings.
+
+Usage:
+    python embedding_cache.py stats
+    python embedding_cache.py compact [--max-mb N]
+    python embedding_cache.py rebuild
+
+compact drops the least recently used entries beyond the size limit and
+reclaims unused space; rebuild re-seeds the cache from the vectors already
+stored in the vector index (e.g. after the cache directory was deleted).
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+KEY_BYTES = 16
+MIN_CAPACITY = 1024
+COPY_ROWS = 65536
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of chunk embeddings keyed by content hash, one per model.
+    
+    Vectors are rows of a memory-mapped float16 matrix; their 16-byte content
+    hashes are appended row for row to a key file, and a uint32 usage column
+    records when each row was last read or written. Lookups go through a
+    sorted array of key prefixes (plus a small dict of recent additions), so
+    the index stays compact for millions of entries. When the cache outgrows
+    max_bytes the least recently used rows are dropped by rewriting the files
+    into a new generation directory, switched in atomically. One writing
+    process at a time.
+    """
+    
+    def __init__(self, cache_dir: str, model_id: str, max_bytes: int):
+        self.model_dir = Path(cache_dir) / model_id.replace('/', '__')
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._open()
+    
+    @staticmethod
+    def content_key(text: str) -> bytes:
+        """Hash of the whitespace-normalized text."""
+        normalized = " ".join(text.split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=KEY_BYTES).digest()
+    
+    def _open(self):
+        current = self.model_dir / "CURRENT"
+        self.generation = current.read_text().strip() if current.exists() else "gen-0"
+        self.data_dir = self.model_dir / self.generation
+        self.data_dir.mkdir(exist_ok=True)
+        
+        self.dim = None
+        self.count = 0
+        self.vectors = None
+        self.usage = None
+        meta_path = self.data_dir / "meta.json"
+        if meta_path.exists():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.dim = json.load(f)["dim"]
+            # Keys are appended after their vectors, so every complete key has its vector
+            keys_path = self.data_dir / "keys.bin"
+            size = keys_path.stat().st_size if keys_path.exists() else 0
+            self.count = size // KEY_BYTES
+            if size % KEY_BYTES:
+                with open(keys_path, 'r+b') as f:
+                    f.truncate(self.count * KEY_BYTES)
+            self._map(self._capacity_on_disk())
+        self._build_index()
+        self.clock = int(self.usage[:self.count].max()) + 1 if self.count else 1
+    
+    def _capacity_on_disk(self) -> int:
+        return (self.data_dir / "vectors.f16").stat().st_size // (self.dim * 2)
+    
+    def _map(self, capacity: int):
+        """(Re)map the vector and usage files at the given row capacity, growing them if needed."""
+        for name, row_bytes in (("vectors.f16", self.dim * 2), ("usage.u32", 4)):
+            path = self.data_dir / name
+            with open(path, 'ab') as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self.vectors = np.memmap(self.data_dir / "vectors.f16", dtype=np.float16, mode='r+', shape=(capacity, self.dim))
+        self.usage = np.memmap(self.data_dir / "usage.u32", dtype=np.uint32, mode='r+', shape=(capacity,))
+    
+    def _create(self, dim: int):
+        self.dim = dim
+        with open(self.data_dir / "meta.json", 'w', encoding='utf-8') as f:
+            json.dump({"model": self.model_id, "dim": dim}, f)
+        self._map(MIN_CAPACITY)
+    
+    def _build_index(self):
+        """Sort the key prefixes of all rows for vectorized lookups."""
+        keys_path = self.data_dir / "keys.bin"
+        if self.count:
+            self.keys = np.fromfile(keys_path, dtype='<u8', count=self.count * 2).reshape(-1, 2)
+        else:
+            self.keys = np.zeros((0, 2), dtype='<u8')
+        self.sorted_rows = np.argsort(self.keys[:, 0], kind='stable')
+        self.sorted_prefixes = self.keys[self.sorted_rows, 0]
+        self.recent: Dict[bytes, int] = {}
+    
+    def _lookup(self, keys: List[bytes]) -> np.ndarray:
+        """Row of each key, or -1."""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if not keys:
+            return rows
+        wanted = np.frombuffer(b"".join(keys), dtype='<u8').reshape(-1, 2)
+        if len(self.sorted_prefixes):
+            pos = np.searchsorted(self.sorted_prefixes, wanted[:, 0])
+            pos = np.minimum(pos, len(self.sorted_prefixes) - 1)
+            candidates = self.sorted_rows[pos]
+            match = (self.sorted_prefixes[pos] == wanted[:, 0]) & (self.keys[candidates, 1] == wanted[:, 1])
+            rows[match] = candidates[match]
+        if self.recent:
+            for i in np.flatnonzero(rows < 0):
+                rows[i] = self.recent.get(keys[i], -1)
+        return rows
+    
+    def get_many(self, keys: List[bytes]) -> Tuple[List[int], np.ndarray]:
+        """
+        Look up embeddings by content key.
+        
+        Returns the positions (into keys) that were found and their embeddings
+        as a float32 matrix in the same order.
+        """
+        with self.lock:
+            rows = self._lookup(keys)
+            found = np.flatnonzero(rows >= 0)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            if not len(found):
+                return [], np.zeros((0, self.dim or 0), dtype=np.float32)
+            hit_rows = rows[found]
+            self.usage[hit_rows] = self.clock
+            self.clock += 1
+            return found.tolist(), np.ascontiguousarray(self.vectors[hit_rows], dtype=np.float32)
+    
+    def put_many(self, keys: List[bytes], embeddings: np.ndarray):
+        """Store embeddings for keys not already cached."""
+        with self.lock:
+            if self.dim is None:
+                self._create(embeddings.shape[1])
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match cache dimension {self.dim}")
+            
+            rows = self._lookup(keys)
+            new = []
+            seen = set()
+            for i in np.flatnonzero(rows < 0):
+                if keys[i] not in seen:
+                    seen.add(keys[i])
+                    new.append(i)
+            if not new:
+                return
+            
+            if self.count + len(new) > self.capacity:
+                self.vectors.flush()
+                self._map(max(self.capacity * 2, self.count + len(new)))
+            start, end = self.count, self.count + len(new)
+            self.vectors[start:end] = embeddings[new].astype(np.float16)
+            self.usage[start:end] = self.clock
+            self.clock += 1
+            self.vectors.flush()
+            
+            with open(self.data_dir / "keys.bin", 'ab') as f:
+                f.write(b"".join(keys[i] for i in new))
+            for offset, i in enumerate(new):
+                self.recent[keys[i]] = start + offset
+            self.count = end
+            
+            if self.count * self._row_bytes() > self.max_bytes:
+                # Evict down to 3/4 of the limit so eviction is not triggered on every write
+                self._compact(int(self.max_bytes * 0.75) // self._row_bytes())
+            elif len(self.recent) > max(4096, self.count // 8):
+                self._build_index()
+    
+    def _row_bytes(self) -> int:
+        return self.dim * 2 + KEY_BYTES + 4
+    
+    def compact(self, max_bytes: int = None):
+        """Drop least recently used entries beyond max_bytes and reclaim unused file space."""
+        with self.lock:
+            if self.dim is None:
+                return
+            max_bytes = self.max_bytes if max_bytes is None else max_bytes
+            self._compact(max_bytes // self._row_bytes())
+    
+    def _compact(self, keep: int):
+        """Rewrite the most recently used rows (at most keep) into a new generation."""
+        self.vectors.flush()
+        self.usage.flush()
+        keys_all = np.fromfile(self.data_dir / "keys.bin", dtype='<u8', count=self.count * 2).reshape(-1, 2)
+        rows = np.arange(self.count)
+        if keep < self.count:
+            rows = np.sort(np.argpartition(-self.usage[:self.count].astype(np.int64), keep)[:keep]) if keep > 0 else rows[:0]
+        
+        new_generation = f"gen-{int(self.generation.split('-')[1]) + 1}"
+        new_dir = self.model_dir / new_generation
+        shutil.rmtree(new_dir, ignore_errors=True)
+        new_dir.mkdir()
+        capacity = max(len(rows), MIN_CAPACITY)
+        vectors = np.memmap(new_dir / "vectors.f16", dtype=np.float16, mode='w+', shape=(capacity, self.dim))
+        usage = np.memmap(new_dir / "usage.u32", dtype=np.uint32, mode='w+', shape=(capacity,))
+        for start in range(0, len(rows), COPY_ROWS):
+            batch = rows[start:start + COPY_ROWS]
+            vectors[start:start + len(batch)] = self.vectors[batch]
+            usage[start:start + len(batch)] = self.usage[batch]
+        vectors.flush()
+        usage.flush()
+        del vectors, usage
+        keys_all[rows].tofile(new_dir / "keys.bin")
+        with open(new_dir / "meta.json", 'w', encoding='utf-8') as f:
+            json.dump({"model": self.model_id, "dim": self.dim}, f)
+        
+        # Switch generations atomically, then drop the old files
+        temp_current = self.model_dir / "CURRENT.tmp"
+        temp_current.write_text(new_generation)
+        os.replace(temp_current, self.model_dir / "CURRENT")
+        old_dir = self.data_dir
+        self.vectors = None
+        self.usage = None
+        self._open()
+        shutil.rmtree(old_dir, ignore_errors=True)
+        print(f"[DEBUG] Embedding cache compacted to {self.count} entries")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.count,
+            "dim": self.dim,
+            "size_mb": round(self.count * self._row_bytes() / (1024 * 1024), 1) if self.dim else 0.0,
+            "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['stats', 'compact', 'rebuild'])
+    parser.add_argument('--max-mb', type=int, default=None, help='Size limit for compact (default: EMBEDDING_CACHE_MAX_MB)')
+    args = parser.parse_args()
+    
+    from config import settings
+    from embedding_backends import embedding_model_id
+    
+    max_mb = args.max_mb if args.max_mb is not None else settings.embedding_cache_max_mb
+    cache = EmbeddingCache(settings.embedding_cache_dir, embedding_model_id(), max_bytes=max_mb * 1024 * 1024)
+    
+    if args.command == 'compact':
+        cache.compact()
+    elif args.command == 'rebuild':
+        from rag_engine import open_configured_store
+        
+        store = open_configured_store()
+        metadata = store.metadata
+        if metadata.get("embedding_model", settings.embedding_model) != settings.embedding_model:
+            print(f"[ERROR] The index was built with {metadata['embedding_model']}, not {settings.embedding_model}")
+            return 1
+        if metadata.get("embedding_reduction", "none") != "none":
+            # The cache holds full-size model vectors; reduced ones cannot be turned back
+            print("[ERROR] The index stores reduced vectors and cannot seed the embedding cache")
+            return 1
+        if not store.stores_exact_vectors:
+            print("[ERROR] The index keeps only compressed vectors and cannot seed the embedding cache")
+            return 1
+        print(f"Re-seeding embedding cache from {store.count()} stored chunks ({settings.vector_store})")
+        try:
+            for _, documents, embeddings in store.iter_entries(batch_size=1024):
+                cache.put_many([cache.content_key(text) for text in documents], embeddings)
+        except NotImplementedError as e:
+            print(f"[ERROR] {e}")
+            return 1
+    
+    for key, value in cache.get_stats().items():
+        print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
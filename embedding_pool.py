@@ -0,0 +1,71 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+class EmbeddingPool:
+    """
+    Pool of encoder worker processes for ingestion embedding.
+    
+    Each worker loads its own copy of the embedding model limited to
+    threads_per_worker intra-op threads, so N workers together can load a
+    many-core machine that a single model instance leaves partly idle.
+    map() spreads text batches across the workers and yields the embeddings
+    in submission order, keeping at most max_in_flight batches queued.
+    """
+    
+    def __init__(self, num_workers: int, threads_per_worker: int = 1, max_in_flight: Optional[int] = None):
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.max_in_flight = max_in_flight or num_workers * 2
+        self.batches = 0
+        # Spawn rather than fork: the parent already holds the model and its thread pools
+        self.executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads_per_worker,)
+        )
+    
+    def map(self, batches: Iterable[List[str]]) -> Iterator[np.ndarray]:
+        """Embed each batch of texts in a worker, yielding results in input order."""
+        in_flight = deque()
+        for texts in batches:
+            in_flight.append(self.executor.submit(_encode_in_worker, texts))
+            if len(in_flight) >= self.max_in_flight:
+                yield self._collect(in_flight.popleft())
+        while in_flight:
+            yield self._collect(in_flight.popleft())
+    
+    def _collect(self, future) -> np.ndarray:
+        embeddings = future.result()
+        self.batches += 1
+        return embeddings
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.num_workers,
+            "threads_per_worker": self.threads_per_worker,
+            "batches": self.batches
+        }
+    
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+_worker_model = None
+
+
+def _init_worker(num_threads: int):
+    """Load the embedding model once per worker process."""
+    global _worker_model
+    from embedding_backends import load_embedding_model
+    _worker_model = load_embedding_model(num_threads=num_threads)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    embeddings = _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+class ExtractionCache:
+    """
+    On-disk cache of cleaned document pages keyed by the SHA-256 of the file bytes.
+    
+    Each entry is a gzipped JSON-lines file of (page_number, text) pairs, written
+    while the pages stream through and renamed into place once complete. Entries
+    are touched on every hit, and the least recently used ones are evicted once
+    the cache grows past max_bytes. Safe to share between worker processes.
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+    
+    @staticmethod
+    def file_key(file_path: str) -> str:
+        """SHA-256 of the file contents."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.jsonl.gz"
+    
+    def load(self, key: str) -> Optional[Iterator[Tuple[int, str]]]:
+        """Stream the cached pages for a key, or return None on a miss."""
+        path = self._entry_path(key)
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        return self._read(path)
+    
+    def _read(self, path: Path) -> Iterator[Tuple[int, str]]:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                page_number, text = json.loads(line)
+                yield page_number, text
+    
+    def store(self, key: str, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """
+        Pass pages through while writing them to the cache.
+        
+        The entry is only committed if the stream is consumed to the end;
+        an error or early stop leaves the cache untouched.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        committed = False
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8', compresslevel=1) as f:
+                for page_number, text in pages:
+                    f.write(json.dumps([page_number, text]) + '\n')
+                    yield page_number, text
+            os.replace(temp_path, self._entry_path(key))
+            committed = True
+        finally:
+            if not committed and os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._evict()
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*.jsonl.gz'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
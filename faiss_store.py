@@ -0,0 +1,434 @@
+"""
+FAISS IVF-PQ vector store for very large corpora.
+
+Usage:
+    python faiss_store.py train    # train now on the vectors buffered so far (server stopped)
+    python faiss_store.py stats
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+try:
+    import faiss  # Optional, for VECTOR_STORE=faiss
+    HAS_FAISS = True
+except ImportError:
+    HAS_FAISS = False
+try:
+    import fcntl  # Unix only; without it the index directory is not locked
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+from vector_store import VectorStore
+
+
+def make_ivfpq_index(dim: int, nlist: int, pq_m: int, pq_bits: int):
+    """Untrained inner-product IVF-PQ index (cosine on normalized vectors)."""
+    if dim % pq_m:
+        raise ValueError(f"FAISS_PQ_M ({pq_m}) must divide the vector dimension ({dim})")
+    quantizer = faiss.IndexFlatIP(dim)
+    return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits, faiss.METRIC_INNER_PRODUCT)
+
+
+class FaissVectorStore(VectorStore):
+    """
+    Approximate search with a FAISS inverted-file index over product-quantized vectors.
+    
+    Each vector is stored as pq_m bytes (at 8 bits per code) instead of
+    dim * 4, and a query only scans the nprobe closest of nlist clusters.
+    Chunk text and metadata live in a SQLite table whose integer row IDs are
+    the FAISS IDs. IVF-PQ must be trained before vectors can be added: until
+    train_size vectors have arrived they are buffered (and searched exactly),
+    then the index is trained on them and later adds go straight in. The
+    index file and the SQLite transaction are both written on flush().
+    
+    Every open store holds a shared lock on the directory; exclusive=True
+    takes an exclusive one instead (the train CLI), so an index cannot be
+    rewritten under a running server. Either fails at once if it conflicts.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        index_metadata: Dict[str, Any],
+        nlist: int = 1024,
+        pq_m: int = 16,
+        pq_bits: int = 8,
+        nprobe: int = 16,
+        train_size: int = 50000,
+        exclusive: bool = False
+    ):
+        super().__init__(index_metadata)
+        if train_size < max(nlist, 2 ** pq_bits):
+            raise ValueError(f"FAISS_TRAIN_SIZE must be at least {max(nlist, 2 ** pq_bits)} for these parameters")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.lock_file = self._lock_directory(exclusive)
+        
+        self.db = sqlite3.connect(str(self.path / "records.sqlite"), check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE NOT NULL,
+                filename TEXT,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE INDEX IF NOT EXISTS records_filename ON records (filename);
+            CREATE TABLE IF NOT EXISTS pending (id INTEGER PRIMARY KEY, vector BLOB NOT NULL);
+        """)
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'index'").fetchone()
+        self.stored_metadata = json.loads(row[0]) if row is not None else dict(index_metadata)
+        self._load()
+    
+    def _lock_directory(self, exclusive: bool):
+        if not HAS_FCNTL:
+            return None
+        lock_file = open(self.path / "lock", "a")
+        try:
+            fcntl.flock(lock_file, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise ValueError(
+                f"The FAISS index in {self.path} is in use by another process"
+                + (" (stop the server first)" if exclusive else " that is rewriting it")
+            )
+        return lock_file
+    
+    def _load(self):
+        index_path = self.path / "index.faiss"
+        self.index = faiss.read_index(str(index_path)) if index_path.exists() else None
+        if self.index is not None:
+            self.index.nprobe = self.nprobe
+        
+        # Vectors received before training, searched exactly until then; the
+        # first len(pending_ids) rows of pending_vectors are in use
+        rows = self.db.execute("SELECT id, vector FROM pending ORDER BY id").fetchall()
+        self.pending_ids = [row[0] for row in rows]
+        self.pending_vectors = np.zeros((0, 0), dtype=np.float32)
+        if rows:
+            self._append_pending(np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows]), 0)
+        self.record_count = self.db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+    
+    def _append_pending(self, vectors: np.ndarray, start: int):
+        """Write vectors to pending rows start.., growing the matrix geometrically up to train_size."""
+        if len(self.pending_vectors) < start + len(vectors):
+            capacity = max(start + len(vectors), min(max(2 * len(self.pending_vectors), 1024), self.train_size))
+            grown = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+            if start:
+                grown[:start] = self.pending_vectors[:start]
+            self.pending_vectors = grown
+        self.pending_vectors[start:start + len(vectors)] = vectors
+    
+    @property
+    def stores_exact_vectors(self) -> bool:
+        return not self.trained
+    
+    @property
+    def trained(self) -> bool:
+        return self.index is not None
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.stored_metadata
+    
+    def vector_dim(self) -> Optional[int]:
+        if self.index is not None:
+            return self.index.d
+        return self.pending_vectors.shape[1] if self.pending_ids else None
+    
+    def count(self) -> int:
+        return self.record_count
+    
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        with self.lock:
+            placeholders = ",".join("?" * len(ids))
+            rows = self.db.execute(f"SELECT chunk_id FROM records WHERE chunk_id IN ({placeholders})", ids)
+            return {row[0] for row in rows}
+    
+    def ids_for_source(self, filename: str) -> List[str]:
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT chunk_id FROM records WHERE filename = ?", (filename,))]
+    
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        normalized = np.ascontiguousarray(embeddings / np.clip(norms, 1e-12, None), dtype=np.float32)
+        with self.lock:
+            # Records and vectors are added together or not at all: a failed
+            # insert, train or index add rolls back to the savepoint
+            if not self.db.in_transaction:
+                self.db.execute("BEGIN")
+            self.db.execute("SAVEPOINT add_records")
+            num_pending = len(self.pending_ids)
+            try:
+                row_ids = []
+                for chunk_id, document, meta in zip(ids, documents, metadatas):
+                    cursor = self.db.execute(
+                        "INSERT INTO records (chunk_id, filename, document, metadata) VALUES (?, ?, ?, ?)",
+                        (chunk_id, meta.get("filename"), document, json.dumps(meta))
+                    )
+                    row_ids.append(cursor.lastrowid)
+                
+                if self.trained:
+                    self.index.add_with_ids(normalized, np.asarray(row_ids, dtype=np.int64))
+                else:
+                    self.db.executemany(
+                        "INSERT INTO pending VALUES (?, ?)",
+                        [(row_id, vector.tobytes()) for row_id, vector in zip(row_ids, normalized)]
+                    )
+                    self._append_pending(normalized, num_pending)
+                    self.pending_ids.extend(row_ids)
+                    if len(self.pending_ids) >= self.train_size:
+                        self.train()
+            except BaseException:
+                self.db.execute("ROLLBACK TO add_records")
+                self.db.execute("RELEASE add_records")
+                del self.pending_ids[num_pending:]
+                raise
+            self.db.execute("RELEASE add_records")
+            self.record_count += len(row_ids)
+            self.dirty = True
+    
+    def train(self):
+        """Train the IVF-PQ index on the buffered vectors and move them into it."""
+        with self.lock:
+            if self.trained:
+                return
+            minimum = max(self.nlist, 2 ** self.pq_bits)
+            if len(self.pending_ids) < minimum:
+                raise ValueError(f"Need at least {minimum} vectors to train, have {len(self.pending_ids)}")
+            vectors = self.pending_vectors[:len(self.pending_ids)]
+            print(f"[DEBUG] Training IVF-PQ index on {len(vectors)} vectors (nlist={self.nlist}, m={self.pq_m})")
+            index = make_ivfpq_index(vectors.shape[1], self.nlist, self.pq_m, self.pq_bits)
+            index.train(vectors)
+            index.add_with_ids(vectors, np.asarray(self.pending_ids, dtype=np.int64))
+            index.nprobe = self.nprobe
+            self.db.execute("DELETE FROM pending")
+            self.index = index
+            self.pending_ids = []
+            self.pending_vectors = np.zeros((0, 0), dtype=np.float32)
+            self.dirty = True
+    
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        with self.lock:
+            self.db.executemany(
+                "UPDATE records SET filename = ?, metadata = ? WHERE chunk_id = ?",
+                [(meta.get("filename"), json.dumps(meta), chunk_id) for chunk_id, meta in zip(ids, metadatas)]
+            )
+            self.dirty = True
+    
+    def delete(self, ids: List[str]):
+        with self.lock:
+            placeholders = ",".join("?" * len(ids))
+            row_ids = [row[0] for row in self.db.execute(f"SELECT id FROM records WHERE chunk_id IN ({placeholders})", ids)]
+            if not row_ids:
+                return
+            if self.trained:
+                self.index.remove_ids(np.asarray(row_ids, dtype=np.int64))
+            else:
+                removed = set(row_ids)
+                keep = [i for i, row_id in enumerate(self.pending_ids) if row_id not in removed]
+                self.pending_ids = [self.pending_ids[i] for i in keep]
+                self.pending_vectors[:len(keep)] = self.pending_vectors[keep]
+                self.db.execute(f"DELETE FROM pending WHERE id IN ({','.join('?' * len(row_ids))})", row_ids)
+            self.db.execute(f"DELETE FROM records WHERE id IN ({','.join('?' * len(row_ids))})", row_ids)
+            self.record_count -= len(row_ids)
+            self.dirty = True
+    
+    def query(self, embeddings: np.ndarray, top_k: int, search_ef: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        queries = np.ascontiguousarray(embeddings, dtype=np.float32)
+        queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        with self.lock:
+            if self.trained:
+                if search_ef:
+                    # Per-call nprobe, so the shared index setting is left alone
+                    params = faiss.SearchParametersIVF(nprobe=search_ef)
+                    scores, row_ids = self.index.search(queries, top_k, params=params)
+                else:
+                    scores, row_ids = self.index.search(queries, top_k)
+            elif self.pending_ids:
+                all_scores = queries @ self.pending_vectors[:len(self.pending_ids)].T
+                k = min(top_k, all_scores.shape[1])
+                top = np.argsort(-all_scores, axis=1)[:, :k]
+                scores = np.take_along_axis(all_scores, top, axis=1)
+                row_ids = np.asarray(self.pending_ids, dtype=np.int64)[top]
+            else:
+                return [[] for _ in range(len(queries))]
+            
+            wanted = sorted({int(row_id) for row_id in row_ids.ravel() if row_id >= 0})
+            records = {}
+            if wanted:
+                rows = self.db.execute(
+                    f"SELECT id, chunk_id, document, metadata FROM records WHERE id IN ({','.join('?' * len(wanted))})",
+                    wanted
+                )
+                records = {row[0]: row[1:] for row in rows}
+        
+        results = []
+        for query_scores, query_rows in zip(scores, row_ids):
+            hits = []
+            for score, row_id in zip(query_scores, query_rows):
+                record = records.get(int(row_id))
+                if record is None:
+                    continue  # -1 padding, or a vector whose record was rolled back
+                chunk_id, document, meta = record
+                hits.append({"id": chunk_id, "text": document, "metadata": json.loads(meta), "similarity": float(score)})
+            results.append(hits)
+        return results
+    
+    def applies_search_ef(self) -> bool:
+        return self.trained  # Buffered vectors are searched exactly
+    
+    def fetch(self, ids: List[str], include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        with self.lock:
+            placeholders = ",".join("?" * len(ids))
+            rows = self.db.execute(
+                f"SELECT chunk_id, document, metadata, id FROM records WHERE chunk_id IN ({placeholders})", ids
+            )
+            records = {}
+            for chunk_id, document, meta, row_id in rows:
+                records[chunk_id] = {"id": chunk_id, "text": document, "metadata": json.loads(meta)}
+                if include_embeddings and not self.trained:
+                    # pending_ids is in ascending row ID order
+                    position = bisect_left(self.pending_ids, row_id)
+                    if position < len(self.pending_ids) and self.pending_ids[position] == row_id:
+                        records[chunk_id]["embedding"] = self.pending_vectors[position].copy()
+        return [records[chunk_id] for chunk_id in ids if chunk_id in records]
+    
+    def iter_entries(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], List[str], np.ndarray]]:
+        """
+        Yield (ids, documents, embeddings) batches; see stores_exact_vectors.
+        
+        Buffered vectors are returned as stored. Once trained, only PQ codes
+        are kept, so the vectors are decoded approximations.
+        """
+        try:
+            last_id = -1
+            while True:
+                with self.lock:
+                    rows = self.db.execute(
+                        "SELECT id, chunk_id, document FROM records WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                    ).fetchall()
+                    if not rows:
+                        return
+                    row_ids = [row[0] for row in rows]
+                    if self.trained:
+                        if self.index.direct_map.type == faiss.DirectMap.NoMap:
+                            # Lets reconstruct_batch() find vectors by their (non-sequential) IDs
+                            self.index.set_direct_map_type(faiss.DirectMap.Hashtable)
+                        vectors = self.index.reconstruct_batch(np.asarray(row_ids, dtype=np.int64))
+                    else:
+                        positions = {row_id: i for i, row_id in enumerate(self.pending_ids)}
+                        vectors = self.pending_vectors[[positions[row_id] for row_id in row_ids]]
+                last_id = row_ids[-1]
+                yield [row[1] for row in rows], [row[2] for row in rows], np.asarray(vectors, dtype=np.float32)
+        finally:
+            with self.lock:
+                if self.trained:
+                    self.index.set_direct_map_type(faiss.DirectMap.NoMap)
+    
+    def iter_documents(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], List[str]]]:
+        last_id = -1
+        while True:
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT id, chunk_id, document FROM records WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1] for row in rows], [row[2] for row in rows]
+    
+    def clear(self):
+        with self.lock:
+            self.db.executescript("DELETE FROM records; DELETE FROM pending;")
+            self.stored_metadata = dict(self.index_metadata)
+            index_path = self.path / "index.faiss"
+            if index_path.exists():
+                index_path.unlink()
+            self.index = None
+            self.pending_ids = []
+            self.pending_vectors = np.zeros((0, 0), dtype=np.float32)
+            self.record_count = 0
+            self.dirty = True
+            self.flush()
+    
+    def flush(self):
+        """Write the index file (atomically), then commit the matching records."""
+        with self.lock:
+            if not self.dirty:
+                return
+            if self.index is not None:
+                temp_path = self.path / "index.faiss.tmp"
+                faiss.write_index(self.index, str(temp_path))
+                os.replace(temp_path, self.path / "index.faiss")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('index', ?)", (json.dumps(self.stored_metadata),))
+            self.db.commit()
+            self.dirty = False
+    
+    def close(self):
+        self.flush()
+        if self.lock_file is not None:
+            self.lock_file.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "trained": self.trained,
+                "vectors_indexed": self.index.ntotal if self.index is not None else 0,
+                "vectors_pending_training": len(self.pending_ids),
+                "train_size": self.train_size,
+                "nlist": self.nlist,
+                "pq_m": self.pq_m,
+                "nprobe": self.nprobe
+            }
+
+
+def main():
+    from vector_store import create_vector_store
+    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['train', 'stats'])
+    args = parser.parse_args()
+    
+    from config import settings
+    
+    path = Path(settings.faiss_index_dir or os.path.join(settings.chroma_db_dir, "faiss_ivfpq"))
+    if not (path / "records.sqlite").exists():
+        print(f"[ERROR] No FAISS index in {path}")
+        return 1
+    
+    # The stored metadata is kept; it is only taken from here for a new index
+    try:
+        store = create_vector_store({}, backend="faiss", exclusive=args.command == 'train')
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    try:
+        if args.command == 'train':
+            store.train()
+        for key, value in store.get_stats().items():
+            print(f"{key}: {value}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class IngestJob:
+    """Tracks the progress of one upload batch through extraction and embedding."""
+    
+    def __init__(self, filenames: List[str]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.files: List[Dict[str, Any]] = [
+            {
+                "filename": filename,
+                "status": "queued",
+                "chunks_total": 0,
+                "chunks_embedded": 0
+            }
+            for filename in filenames
+        ]
+        # Where each file was saved; None for files that were not saved
+        self.file_paths: List[Optional[str]] = [None] * len(filenames)
+    
+    def fail_file(self, index: int, error: str):
+        """Mark a single file as failed."""
+        self.files[index].update({"status": "failed", "success": False, "error": error})
+    
+    def finish_file(self, index: int, result: Dict[str, Any]):
+        """Record the upload result for a single file."""
+        self.files[index].update(result)
+        self.files[index]["status"] = "completed" if result.get("success") else "failed"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize the job, including throughput so far."""
+        chunks_total = sum(f["chunks_total"] for f in self.files)
+        chunks_embedded = sum(f["chunks_embedded"] for f in self.files)
+        files_done = sum(1 for f in self.files if f["status"] in ("completed", "failed"))
+        
+        elapsed = None
+        chunks_per_second = None
+        files_per_second = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            if elapsed > 0:
+                chunks_per_second = round(chunks_embedded / elapsed, 2)
+                files_per_second = round(files_done / elapsed, 2)
+        
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "num_files": len(self.files),
+            "files_done": files_done,
+            "chunks_total": chunks_total,
+            "chunks_embedded": chunks_embedded,
+            "chunks_per_second": chunks_per_second,
+            "files_per_second": files_per_second,
+            "errors": [
+                {"filename": f["filename"], "error": f["error"]}
+                for f in self.files if f.get("error")
+            ] + ([{"filename": None, "error": self.error}] if self.error else []),
+            "files": self.files
+        }
+
+
+class IngestJobQueue:
+    """Bounded queue of ingest jobs drained by background worker tasks."""
+    
+    def __init__(
+        self,
+        handler: Callable[[IngestJob], Awaitable[None]],
+        max_queued: int,
+        num_workers: int = 1,
+        history_size: int = 100
+    ):
+        self.handler = handler
+        self.num_workers = num_workers
+        self.history_size = history_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self.workers: List[asyncio.Task] = []
+    
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        for _ in range(self.num_workers):
+            self.workers.append(asyncio.create_task(self._worker()))
+    
+    async def stop(self):
+        """Cancel the worker tasks."""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+    
+    def full(self) -> bool:
+        return self.queue.full()
+    
+    def submit(self, job: IngestJob):
+        """Queue a job. Raises asyncio.QueueFull when the queue is at capacity."""
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self._trim_history()
+    
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+    
+    def list(self) -> List[IngestJob]:
+        return list(self.jobs.values())
+    
+    def _trim_history(self):
+        """Forget the oldest finished jobs beyond history_size."""
+        excess = len(self.jobs) - self.history_size
+        for job_id in [
+            job_id for job_id, job in self.jobs.items()
+            if job.status in ("completed", "failed")
+        ][:max(excess, 0)]:
+            del self.jobs[job_id]
+    
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                await self.handler(job)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Cancelled"
+                raise
+            except Exception as e:
+                print(f"[ERROR] Ingest job {job.id} failed: {str(e)}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self.queue.task_done()
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, JSONResponse
@@ -6,12 +6,20 @@ from pydantic import BaseModel
 from typing import List, Optional
 import os
 import shutil
+import asyncio
+import functools
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 from config import settings
-from document_processor import DocumentProcessor
+from document_processor import DocumentProcessor, build_chunk_metadata, process_document_in_worker
+from dim_reduction import pca_path
 from rag_engine import RAGEngine
 from llm_service import LLMService
+from ingest_jobs import IngestJob, IngestJobQueue
+from upload_receiver import receive_uploads, UploadTooLargeError, UploadLimitError, UploadFormatError
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -33,6 +41,11 @@ app.add_middleware(
 doc_processor = None
 rag_engine = None
 llm_service = None  # Will be initialized on first query (lazy loading)
+ingest_pool = None  # Process pool for parallel extraction of multi-file uploads
+ingest_executor = None  # Threads for blocking upload work (file I/O, embedding, Chroma writes)
+query_executor = None  # Threads for blocking query work, kept separate so ingests can't starve it
+batch_llm_executor = None  # Threads for /query/batch answer generation, so batches can't starve /query
+job_queue = None  # Background queue that runs uploaded batches
 
 # Ensure upload directory exists
 Path(settings.upload_dir).mkdir(exist_ok=True)
@@ -40,35 +53,105 @@ Path(settings.upload_dir).mkdir(exist_ok=True)
 
 @app.on_event("startup")
 async def startup_event():
-    """Clear the knowledge base on startup to start fresh."""
-    global doc_processor, rag_engine
-    
-    print("[STARTUP] Starting fresh - clearing all previous data...")
+    """Initialize services, reopening the persisted index unless INDEX_PERSISTENCE=wipe."""
+    global doc_processor, rag_engine, ingest_pool, ingest_executor, query_executor, batch_llm_executor, job_queue
     
-    # Delete ChromaDB directory completely
-    chroma_path = Path(settings.chroma_db_dir)
-    if chroma_path.exists():
-        shutil.rmtree(chroma_path)
-        print(f"[STARTUP] Deleted ChromaDB directory: {settings.chroma_db_dir}")
-    
-    # Clear uploaded documents folder
-    upload_path = Path(settings.upload_dir)
-    if upload_path.exists():
-        for file in upload_path.iterdir():
-            if file.is_file():
-                file.unlink()
-        print(f"[STARTUP] Cleared uploaded documents folder: {settings.upload_dir}")
+    start_time = time.perf_counter()
+    if settings.index_persistence == "wipe":
+        print("[STARTUP] Starting fresh - clearing all previous data...")
+        
+        # Delete the ChromaDB directory's contents, keeping a fitted PCA projection
+        chroma_path = Path(settings.chroma_db_dir)
+        if chroma_path.exists():
+            projection = Path(pca_path()).resolve()
+            for entry in chroma_path.iterdir():
+                if entry.resolve() == projection:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry)
+                else:
+                    entry.unlink()
+            print(f"[STARTUP] Cleared ChromaDB directory: {settings.chroma_db_dir}")
+        
+        # Clear uploaded documents folder
+        upload_path = Path(settings.upload_dir)
+        if upload_path.exists():
+            for file in upload_path.iterdir():
+                if file.is_file():
+                    file.unlink()
+            print(f"[STARTUP] Cleared uploaded documents folder: {settings.upload_dir}")
+    elif settings.index_persistence != "persist":
+        raise ValueError(f"Unsupported INDEX_PERSISTENCE: {settings.index_persistence} (use persist or wipe)")
     
-    # Now initialize services with clean slate
     doc_processor = DocumentProcessor()
     rag_engine = RAGEngine()
-    print("[STARTUP] Services initialized with clean database")
+    
+    workers = settings.ingest_process_workers or os.cpu_count() or 1
+    if workers > 1:
+        # Spawn rather than fork: the parent already holds the embedding model's threads
+        ingest_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        print(f"[STARTUP] Ingest process pool started with {workers} workers")
+    
+    ingest_executor = ThreadPoolExecutor(
+        max_workers=settings.ingest_thread_workers,
+        thread_name_prefix="ingest"
+    )
+    query_executor = ThreadPoolExecutor(
+        max_workers=settings.query_thread_workers,
+        thread_name_prefix="query"
+    )
+    batch_llm_executor = ThreadPoolExecutor(
+        max_workers=max(1, settings.batch_query_llm_concurrency),
+        thread_name_prefix="batch-llm"
+    )
+    
+    job_queue = IngestJobQueue(
+        _run_ingest_job,
+        max_queued=settings.ingest_queue_size,
+        num_workers=settings.ingest_job_workers,
+        history_size=settings.ingest_job_history
+    )
+    job_queue.start()
+    print(
+        f"[STARTUP] Services initialized with {rag_engine.store.count()} indexed chunks "
+        f"in {time.perf_counter() - start_time:.1f}s ({settings.index_persistence} mode)"
+    )
     print("[STARTUP] Ready to accept new documents!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the ingest job workers, process pools and request executors."""
+    global ingest_pool, ingest_executor, query_executor, batch_llm_executor, job_queue
+    
+    if job_queue is not None:
+        await job_queue.stop()
+    if rag_engine is not None:
+        rag_engine.close()
+    if ingest_pool is not None:
+        ingest_pool.shutdown(cancel_futures=True)
+        ingest_pool = None
+    for executor in (ingest_executor, query_executor, batch_llm_executor):
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    ingest_executor = None
+    query_executor = None
+    batch_llm_executor = None
+
+
+async def run_blocking(executor, func, *args, **kwargs):
+    """Run a blocking call on the given executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
 class QueryRequest(BaseModel):
     query: str
     top_k: Optional[int] = None
+    ef: Optional[int] = None  # Per-request HNSW search_ef (FAISS nprobe); higher is slower but more accurate
 
 
 class QueryResponse(BaseModel):
@@ -77,6 +160,26 @@ class QueryResponse(BaseModel):
     sources: List[dict]
     num_sources: int
     model: str
+    timing: Optional[dict] = None  # Milliseconds: retrieval_ms, rerank_ms, generation_ms, total_ms
+    ef_applied: Optional[bool] = None  # Whether the requested ef was honoured (None when none was given)
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    top_k: Optional[int] = None
+    ef: Optional[int] = None
+
+
+class BatchQueryResult(QueryResponse):
+    success: bool = True
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult]
+    num_queries: int
+    timing: Optional[dict] = None  # For the whole batch, like QueryResponse.timing
+    ef_applied: Optional[bool] = None
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -101,84 +204,191 @@ async def health_check():
     }
 
 
-@app.post("/upload")
-async def upload_documents(files: List[UploadFile] = File(...)):
-    """
-    Upload and process documents.
-    Supports: PDF, TXT, DOCX
-    """
-    global doc_processor, rag_engine
+def _index_processed_document(filename: str, process_result: dict, progress_callback=None) -> dict:
+    """Embed and store the chunks of a processed document, returning the per-file upload result."""
+    if not process_result["success"]:
+        return {
+            "filename": filename,
+            "success": False,
+            "error": process_result.get("error")
+        }
     
-    if doc_processor is None or rag_engine is None:
-        raise HTTPException(status_code=503, detail="Services not initialized yet. Please wait a moment.")
+    # Add to vector database
+    chunks = process_result["chunks"]
+    metadata = build_chunk_metadata(filename, process_result)
     
-    results = []
+    add_result = rag_engine.sync_document(filename, chunks, metadata, progress_callback=progress_callback)
     
-    for file in files:
+    if add_result["success"]:
+        num_new = add_result["num_chunks_added"]
+        num_deduplicated = add_result["num_chunks_deduplicated"]
+        num_removed = add_result["num_chunks_removed"]
+        return {
+            "filename": filename,
+            "success": True,
+            "num_chunks": len(chunks),
+            "num_new_chunks": num_new,
+            "num_deduplicated_chunks": num_deduplicated,
+            "num_removed_chunks": num_removed,
+            "message": (
+                f"Successfully processed {len(chunks)} chunks "
+                f"({num_new} new, {num_deduplicated} already indexed, {num_removed} removed)"
+            )
+        }
+    return {
+        "filename": filename,
+        "success": False,
+        "error": f"Failed to add to database: {add_result.get('error')}"
+    }
+
+
+async def _run_ingest_job(job: IngestJob):
+    """Extract, chunk, embed and store every saved file of an upload batch."""
+    saved = [
+        (index, job.files[index]["filename"], file_path)
+        for index, file_path in enumerate(job.file_paths)
+        if file_path is not None
+    ]
+    
+    # Extract and chunk every file in parallel; embed each one in this
+    # process as soon as its extraction finishes, in upload order
+    if ingest_pool is not None and len(saved) > 1:
+        futures = [
+            ingest_pool.submit(process_document_in_worker, file_path, filename)
+            for _, filename, file_path in saved
+        ]
+    else:
+        futures = [None] * len(saved)
+    
+    for (index, filename, file_path), future in zip(saved, futures):
+        file_status = job.files[index]
+        file_status["status"] = "extracting"
         try:
-            # Validate file size
-            file.file.seek(0, 2)  # Seek to end
-            file_size = file.file.tell()
-            file.file.seek(0)  # Reset to beginning
-            
-            if file_size > settings.max_file_size_mb * 1024 * 1024:
-                results.append({
-                    "filename": file.filename,
-                    "success": False,
-                    "error": f"File size exceeds {settings.max_file_size_mb}MB limit"
-                })
-                continue
+            if future is not None:
+                process_result = await asyncio.wrap_future(future)
+            else:
+                process_result = await run_blocking(
+                    ingest_executor, doc_processor.process_document, file_path, filename
+                )
             
-            # Save file
-            file_path = os.path.join(settings.upload_dir, file.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            if process_result["success"]:
+                file_status["chunks_total"] = process_result["num_chunks"]
+                file_status["status"] = "embedding"
             
-            # Process document
-            process_result = doc_processor.process_document(file_path, file.filename)
+            def record_progress(embedded: int, total: int, file_status=file_status):
+                file_status["chunks_embedded"] = embedded
+                file_status["chunks_total"] = total
             
-            if process_result["success"]:
-                # Add to vector database
-                chunks = process_result["chunks"]
-                metadata = [
-                    {
-                        "filename": file.filename,
-                        "chunk_index": i,
-                        "total_chunks": len(chunks)
-                    }
-                    for i in range(len(chunks))
-                ]
-                
-                add_result = rag_engine.add_documents(chunks, metadata)
-                
-                if add_result["success"]:
-                    results.append({
-                        "filename": file.filename,
-                        "success": True,
-                        "num_chunks": len(chunks),
-                        "message": f"Successfully processed and indexed {len(chunks)} chunks"
-                    })
-                else:
-                    results.append({
-                        "filename": file.filename,
-                        "success": False,
-                        "error": f"Failed to add to database: {add_result.get('error')}"
-                    })
-            else:
-                results.append({
-                    "filename": file.filename,
-                    "success": False,
-                    "error": process_result.get("error")
-                })
-        
+            result = await run_blocking(
+                ingest_executor,
+                _index_processed_document,
+                filename,
+                process_result,
+                progress_callback=record_progress
+            )
+            job.finish_file(index, result)
         except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "success": False,
-                "error": str(e)
-            })
+            job.fail_file(index, str(e))
+
+
+@app.post(
+    "/upload",
+    status_code=202,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "files": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                        },
+                        "required": ["files"]
+                    }
+                }
+            }
+        }
+    }
+)
+async def upload_documents(request: Request):
+    """
+    Upload documents and queue them for background processing.
+    Supports: PDF, TXT, DOCX
+    
+    Files are streamed to disk as they arrive and the request is rejected
+    with 413 as soon as one exceeds max_file_size_mb, or the request exceeds
+    max_upload_total_mb or max_upload_files.
+    Returns a job ID immediately; poll /jobs/{job_id} for progress.
+    """
+    global doc_processor, rag_engine
+    
+    if doc_processor is None or rag_engine is None or job_queue is None:
+        raise HTTPException(status_code=503, detail="Services not initialized yet. Please wait a moment.")
+    
+    if job_queue.full():
+        raise HTTPException(status_code=429, detail="Ingest queue is full. Please retry shortly.")
+    
+    try:
+        received = await receive_uploads(
+            request,
+            upload_dir=settings.upload_dir,
+            max_bytes=settings.max_file_size_mb * 1024 * 1024,
+            max_total_bytes=settings.max_upload_total_mb * 1024 * 1024,
+            max_files=settings.max_upload_files
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File size exceeds {settings.max_file_size_mb}MB limit: {e.filename}"
+        )
+    except UploadLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not received:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    
+    job = IngestJob([item["filename"] for item in received])
+    job.file_paths = [item["file_path"] for item in received]
+    
+    try:
+        job_queue.submit(job)
+    except asyncio.QueueFull:
+        for file_path in job.file_paths:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        raise HTTPException(status_code=429, detail="Ingest queue is full. Please retry shortly.")
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "num_files": len(received),
+        "status_url": f"/jobs/{job.id}"
+    }
+
+
+@app.get("/jobs")
+async def list_jobs():
+    """List recent ingest jobs with their progress."""
+    if job_queue is None:
+        return {"jobs": [], "queued": 0, "max_queued": settings.ingest_queue_size}
     
-    return {"results": results}
+    return {
+        "jobs": [job.to_dict() for job in job_queue.list()],
+        "queued": job_queue.queue.qsize(),
+        "max_queued": settings.ingest_queue_size
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the progress of a single ingest job."""
+    job = job_queue.get(job_id) if job_queue is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
 
 
 @app.post("/query", response_model=QueryResponse)
@@ -188,14 +398,17 @@ async def query_knowledge_base(request: QueryRequest):
     """
     global llm_service, rag_engine
     
+    start_time = time.perf_counter()
     if rag_engine is None:
         raise HTTPException(status_code=503, detail="Services not initialized yet. Please wait a moment.")
+    if request.ef is not None and request.ef < 1:
+        raise HTTPException(status_code=400, detail="ef must be a positive integer")
     
     try:
         # Initialize LLM service if not already done
         if llm_service is None:
             try:
-                llm_service = LLMService()
+                llm_service = await run_blocking(query_executor, LLMService)
             except Exception as e:
                 raise HTTPException(
                     status_code=500,
@@ -203,9 +416,12 @@ async def query_knowledge_base(request: QueryRequest):
                 )
         
         # Search for relevant documents
-        search_results = rag_engine.search(
+        search_results = await run_blocking(
+            query_executor,
+            rag_engine.search,
             query=request.query,
-            top_k=request.top_k
+            top_k=request.top_k,
+            search_ef=request.ef
         )
         
         if not search_results["success"]:
@@ -215,18 +431,26 @@ async def query_knowledge_base(request: QueryRequest):
             )
         
         retrieved_chunks = search_results["results"]
+        timing = dict(search_results["timing"])
         
         if not retrieved_chunks:
+            timing["generation_ms"] = 0.0
+            timing["total_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
             return QueryResponse(
                 answer="I couldn't find any relevant information in the knowledge base to answer your question.",
                 query=request.query,
                 sources=[],
                 num_sources=0,
-                model=settings.llm_model
+                model=settings.llm_model,
+                timing=timing,
+                ef_applied=search_results["ef_applied"]
             )
         
         # Generate answer using LLM
-        llm_result = llm_service.synthesize_answer(
+        generation_start = time.perf_counter()
+        llm_result = await run_blocking(
+            query_executor,
+            llm_service.synthesize_answer,
             query=request.query,
             context_chunks=retrieved_chunks
         )
@@ -236,13 +460,17 @@ async def query_knowledge_base(request: QueryRequest):
                 status_code=500,
                 detail=f"Answer generation failed: {llm_result.get('error')}"
             )
+        timing["generation_ms"] = round((time.perf_counter() - generation_start) * 1000, 2)
+        timing["total_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
         
         return QueryResponse(
             answer=llm_result["answer"],
             query=request.query,
             sources=retrieved_chunks,
             num_sources=len(retrieved_chunks),
-            model=llm_result["model"]
+            model=llm_result["model"],
+            timing=timing,
+            ef_applied=search_results["ef_applied"]
         )
     
     except HTTPException:
@@ -251,6 +479,106 @@ async def query_knowledge_base(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_knowledge_base_batch(request: BatchQueryRequest):
+    """
+    Answer many questions in one request.
+    
+    The questions are embedded in one encoder call and searched with one
+    multi-query vector search; answers are then synthesized with at most
+    BATCH_QUERY_LLM_CONCURRENCY LLM calls in flight. Results come back in
+    question order, and a failed answer is reported on its own result
+    rather than failing the batch.
+    """
+    global llm_service, rag_engine
+    
+    start_time = time.perf_counter()
+    if rag_engine is None:
+        raise HTTPException(status_code=503, detail="Services not initialized yet. Please wait a moment.")
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(request.queries) > settings.batch_query_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_query_max_questions} queries per batch"
+        )
+    if request.ef is not None and request.ef < 1:
+        raise HTTPException(status_code=400, detail="ef must be a positive integer")
+    
+    if llm_service is None:
+        try:
+            llm_service = await run_blocking(query_executor, LLMService)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to initialize LLM service: {str(e)}"
+            )
+    
+    search_results = await run_blocking(
+        query_executor,
+        rag_engine.search_batch,
+        queries=request.queries,
+        top_k=request.top_k,
+        search_ef=request.ef
+    )
+    if not search_results["success"]:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Search failed: {search_results.get('error')}"
+        )
+    
+    async def answer(result: dict) -> BatchQueryResult:
+        retrieved_chunks = result["results"]
+        if not retrieved_chunks:
+            return BatchQueryResult(
+                answer="I couldn't find any relevant information in the knowledge base to answer your question.",
+                query=result["query"],
+                sources=[],
+                num_sources=0,
+                model=settings.llm_model
+            )
+        # Answers from all batch requests share batch_llm_executor's threads
+        try:
+            llm_result = await run_blocking(
+                batch_llm_executor,
+                llm_service.synthesize_answer,
+                query=result["query"],
+                context_chunks=retrieved_chunks
+            )
+        except Exception as e:
+            llm_result = {"success": False, "error": str(e)}
+        if not llm_result["success"]:
+            return BatchQueryResult(
+                answer="",
+                query=result["query"],
+                sources=retrieved_chunks,
+                num_sources=len(retrieved_chunks),
+                model=settings.llm_model,
+                success=False,
+                error=f"Answer generation failed: {llm_result.get('error')}"
+            )
+        return BatchQueryResult(
+            answer=llm_result["answer"],
+            query=result["query"],
+            sources=retrieved_chunks,
+            num_sources=len(retrieved_chunks),
+            model=llm_result["model"]
+        )
+    
+    # gather keeps the results in question order
+    generation_start = time.perf_counter()
+    results = await asyncio.gather(*(answer(result) for result in search_results["results"]))
+    timing = dict(search_results["timing"])
+    timing["generation_ms"] = round((time.perf_counter() - generation_start) * 1000, 2)
+    timing["total_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+    return BatchQueryResponse(
+        results=results,
+        num_queries=len(results),
+        timing=timing,
+        ef_applied=search_results["ef_applied"]
+    )
+
+
 @app.get("/stats")
 async def get_stats():
     """Get knowledge base statistics."""
@@ -259,7 +587,7 @@ async def get_stats():
     if rag_engine is None:
         return {"success": True, "total_chunks": 0, "collection_name": "knowledge_base"}
     
-    stats = rag_engine.get_collection_stats()
+    stats = await run_blocking(query_executor, rag_engine.get_collection_stats)
     return stats
 
 
@@ -271,7 +599,7 @@ async def clear_knowledge_base():
     if rag_engine is None:
         return {"success": True, "message": "Knowledge base already empty"}
     
-    result = rag_engine.clear_collection()
+    result = await run_blocking(ingest_executor, rag_engine.clear_collection)
     
     # Also clear uploaded files
     try:
@@ -293,9 +621,9 @@ async def test_llm_connection():
     
     try:
         if llm_service is None:
-            llm_service = LLMService()
+            llm_service = await run_blocking(query_executor, LLMService)
         
-        result = llm_service.test_connection()
+        result = await run_blocking(query_executor, llm_service.test_connection)
         return result
     except Exception as e:
         return {
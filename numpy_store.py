@@ -0,0 +1,260 @@
+import base64
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from vector_store import VectorStore
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact brute-force search over an in-memory float32 matrix.
+    
+    Vectors are L2-normalized on insert, so a query is one matrix product
+    followed by argpartition for the top k; results are exact. Deletes move
+    the last row into the freed slot, keeping the matrix dense. Best for
+    corpora up to a few tens of thousands of chunks.
+    
+    On disk the store is a snapshot, one .npz file (vectors plus JSON
+    records) replaced atomically, plus a log of the adds, metadata updates
+    and deletes since then. flush() appends to the log, so an ingest costs
+    in proportion to what it changed; the snapshot is only rewritten once
+    the log has grown larger than it. Opening the store replays the log.
+    """
+    
+    def __init__(self, path: str, index_metadata: Dict[str, Any]):
+        super().__init__(index_metadata)
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.log_lines: List[str] = []
+        self.snapshot_needed = False
+        if (self.path / "store.npz").exists():
+            self._load()
+        else:
+            self._reset()
+        self._replay_log()
+    
+    def _reset(self):
+        self.stored_metadata = dict(self.index_metadata)
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.dirty = True
+        # Logged changes no longer apply to the emptied store
+        self.log_lines = []
+        self.snapshot_needed = True
+    
+    def _load(self):
+        with np.load(self.path / "store.npz") as data:
+            index = json.loads(data["index"].tobytes().decode("utf-8"))
+            self.vectors = data["vectors"]
+        self.stored_metadata = index["metadata"]
+        self.ids = index["ids"]
+        self.documents = index["documents"]
+        self.metadatas = index["metadatas"]
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+    
+    def _replay_log(self):
+        """
+        Apply the changes logged since the snapshot was written.
+        
+        Replaying is idempotent (adds skip stored IDs, deletes skip missing
+        ones), so a crash between writing a snapshot and removing the log
+        leaves a consistent store. A line cut short by a crash ends the
+        replay, and the next flush() rewrites the snapshot without it.
+        """
+        log_path = self.path / "store.log"
+        if not log_path.exists():
+            return
+        with open(log_path, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    self.snapshot_needed = True
+                    self.dirty = True
+                    break
+                if "add" in entry:
+                    rows = [row for row in entry["add"] if row[0] not in self.rows]
+                    if rows:
+                        vectors = np.vstack([np.frombuffer(base64.b64decode(row[3]), dtype=np.float32) for row in rows])
+                        self._append_rows([row[0] for row in rows], vectors, [row[1] for row in rows], [row[2] for row in rows])
+                elif "update" in entry:
+                    self.update_metadata([row[0] for row in entry["update"]], [row[1] for row in entry["update"]])
+                else:
+                    self.delete(entry["delete"])
+        self.log_lines = []
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.stored_metadata
+    
+    def vector_dim(self) -> Optional[int]:
+        return self.vectors.shape[1] if self.ids else None
+    
+    def count(self) -> int:
+        return len(self.ids)
+    
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        with self.lock:
+            return {chunk_id for chunk_id in ids if chunk_id in self.rows}
+    
+    def ids_for_source(self, filename: str) -> List[str]:
+        with self.lock:
+            return [chunk_id for chunk_id, meta in zip(self.ids, self.metadatas) if meta.get("filename") == filename]
+    
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        normalized = (embeddings / np.clip(norms, 1e-12, None)).astype(np.float32)
+        with self.lock:
+            for chunk_id in ids:
+                if chunk_id in self.rows:
+                    raise ValueError(f"ID already exists: {chunk_id}")
+            self._append_rows(ids, normalized, documents, metadatas)
+            self.log_lines.append(json.dumps({"add": [
+                [chunk_id, document, meta, base64.b64encode(vector.tobytes()).decode("ascii")]
+                for chunk_id, document, meta, vector in zip(ids, documents, metadatas, normalized)
+            ]}))
+    
+    def _append_rows(self, ids: List[str], normalized: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Store rows of already-normalized vectors."""
+        with self.lock:
+            start = len(self.ids)
+            if len(self.vectors) < start + len(ids):
+                # Grow geometrically so repeated small adds stay amortized O(n)
+                capacity = max(start + len(ids), 2 * len(self.vectors), 1024)
+                grown = np.zeros((capacity, normalized.shape[1]), dtype=np.float32)
+                if start:
+                    grown[:start] = self.vectors[:start]
+                self.vectors = grown
+            self.vectors[start:start + len(ids)] = normalized
+            for offset, chunk_id in enumerate(ids):
+                self.rows[chunk_id] = start + offset
+            self.ids.extend(ids)
+            self.documents.extend(documents)
+            self.metadatas.extend(metadatas)
+            self.dirty = True
+    
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        with self.lock:
+            for chunk_id, meta in zip(ids, metadatas):
+                row = self.rows.get(chunk_id)
+                if row is not None:
+                    self.metadatas[row] = meta
+            self.log_lines.append(json.dumps({"update": [[chunk_id, meta] for chunk_id, meta in zip(ids, metadatas)]}))
+            self.dirty = True
+    
+    def delete(self, ids: List[str]):
+        with self.lock:
+            removed = []
+            for chunk_id in ids:
+                row = self.rows.pop(chunk_id, None)
+                if row is None:
+                    continue
+                removed.append(chunk_id)
+                last = len(self.ids) - 1
+                if row != last:
+                    self.vectors[row] = self.vectors[last]
+                    self.ids[row] = self.ids[last]
+                    self.documents[row] = self.documents[last]
+                    self.metadatas[row] = self.metadatas[last]
+                    self.rows[self.ids[row]] = row
+                self.ids.pop()
+                self.documents.pop()
+                self.metadatas.pop()
+            if removed:
+                self.log_lines.append(json.dumps({"delete": removed}))
+            self.dirty = True
+    
+    def query(self, embeddings: np.ndarray, top_k: int, search_ef: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        with self.lock:
+            n = len(self.ids)
+            if n == 0:
+                return [[] for _ in range(len(embeddings))]
+            k = min(top_k, n)
+            scores = embeddings @ self.vectors[:n].T
+            scores /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            results = []
+            for query_scores, candidates in zip(scores, top):
+                ranked = candidates[np.argsort(-query_scores[candidates])]
+                results.append([
+                    {
+                        "id": self.ids[row],
+                        "text": self.documents[row],
+                        "metadata": self.metadatas[row],
+                        "similarity": float(query_scores[row])
+                    }
+                    for row in ranked
+                ])
+            return results
+    
+    def fetch(self, ids: List[str], include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        with self.lock:
+            records = []
+            for chunk_id in ids:
+                row = self.rows.get(chunk_id)
+                if row is None:
+                    continue
+                record = {"id": chunk_id, "text": self.documents[row], "metadata": self.metadatas[row]}
+                if include_embeddings:
+                    record["embedding"] = self.vectors[row].copy()
+                records.append(record)
+            return records
+    
+    def iter_entries(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], List[str], np.ndarray]]:
+        with self.lock:
+            n = len(self.ids)
+            ids, documents, vectors = list(self.ids), list(self.documents), self.vectors[:n].copy()
+        for start in range(0, n, batch_size):
+            yield ids[start:start + batch_size], documents[start:start + batch_size], vectors[start:start + batch_size]
+    
+    def clear(self):
+        with self.lock:
+            self._reset()
+            self.flush()
+    
+    def flush(self):
+        """Persist changes: append them to the log, or rewrite the snapshot once the log outgrows it."""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            snapshot_path = self.path / "store.npz"
+            log_path = self.path / "store.log"
+            pending = "".join(line + "\n" for line in self.log_lines).encode("utf-8")
+            log_bytes = log_path.stat().st_size if log_path.exists() else 0
+            if (
+                self.snapshot_needed
+                or not snapshot_path.exists()
+                or log_bytes + len(pending) > snapshot_path.stat().st_size
+            ):
+                self._write_snapshot()
+                if log_path.exists():
+                    log_path.unlink()
+                self.snapshot_needed = False
+            elif pending:
+                with open(log_path, "ab") as log:
+                    log.write(pending)
+            self.log_lines = []
+            self.dirty = False
+    
+    def _write_snapshot(self):
+        """Write the whole store as one .npz file, replacing the previous one atomically."""
+        with self.lock:
+            index = json.dumps({
+                "metadata": self.stored_metadata,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas
+            }).encode("utf-8")
+            temp_path = self.path / "store.tmp.npz"
+            np.savez(temp_path, vectors=self.vectors[:len(self.ids)], index=np.frombuffer(index, dtype=np.uint8))
+            os.replace(temp_path, self.path / "store.npz")
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache of query embeddings.
+    
+    Keys are the normalized query text plus the embedding model name. When a
+    lookup arrives for a different model than the cached entries were made
+    with, the whole cache is dropped so stale vectors are never served.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self.model_name: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.split()).lower()
+    
+    def _check_model(self, model_name: str):
+        if model_name != self.model_name:
+            self.entries.clear()
+            self.model_name = model_name
+    
+    def get(self, query: str, model_name: str) -> Optional[Any]:
+        key = (self.normalize(query), model_name)
+        with self.lock:
+            self._check_model(model_name)
+            embedding = self.entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+    
+    def put(self, query: str, model_name: str, embedding: Any):
+        if self.max_size <= 0:
+            return
+        key = (self.normalize(query), model_name)
+        with self.lock:
+            self._check_model(model_name)
+            # Copy so a cached row doesn't keep its whole encoder batch alive
+            self.entries[key] = embedding.copy() if hasattr(embedding, "copy") else embedding
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
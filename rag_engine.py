@@ -1,63 +1,455 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
-import uuid
+import numpy as np
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+import hashlib
+import os
+import shutil
+import time
 from config import settings
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from embedding_backends import embedding_model_id, load_embedding_model
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache
+from dim_reduction import load_reducer
+from embedding_pool import EmbeddingPool
+from query_cache import QueryEmbeddingCache
+from reranker import load_reranker
+from vector_store import create_vector_store
+
+
+# Number of IDs per vector store lookup, update or delete call
+ADD_BATCH_SIZE = 256
+
+
+def make_chunk_id(text: str, source: str) -> str:
+    """Deterministic chunk ID from the whitespace-normalized chunk text and its source."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{source}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+def index_metadata(embedding_dim: int, reducer=None) -> Dict[str, Any]:
+    """Metadata recorded with the index so a reopened index can be verified."""
+    return {
+        "embedding_model": settings.embedding_model,
+        "embedding_dim": embedding_dim,
+        "embedding_reduction": reducer.describe() if reducer is not None else "none"
+    }
+
+
+def open_configured_store(backend: str = None):
+    """
+    Open the configured vector store outside RAGEngine (CLIs and benchmarks).
+    
+    The store is opened with the same metadata RAGEngine records, so one
+    that gets created (or rewritten on close) is labelled with the configured
+    model, dimension and reduction rather than left blank. Loads the
+    embedding model to learn its dimension.
+    """
+    model_dim = load_embedding_model().get_sentence_embedding_dimension()
+    reducer = load_reducer(model_dim)
+    return create_vector_store(index_metadata(reducer.dim if reducer is not None else model_dim, reducer), backend)
 
 
 class RAGEngine:
     """Handles embeddings generation, vector storage, and retrieval."""
     
     def __init__(self):
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer(settings.embedding_model)
+        # Initialize embedding model (PyTorch or ONNX Runtime, see EMBEDDING_BACKEND)
+        self.embedding_model = load_embedding_model()
+        max_seq_length = self.embedding_model.max_seq_length
+        if settings.chunking_strategy == "tokens" and max_seq_length and settings.chunk_max_tokens > max_seq_length:
+            print(
+                f"[WARNING] CHUNK_MAX_TOKENS={settings.chunk_max_tokens} exceeds the embedding model's "
+                f"max sequence length ({max_seq_length}); chunk tails will be truncated"
+            )
         
-        # Initialize ChromaDB
-        self.chroma_client = chromadb.PersistentClient(
-            path=settings.chroma_db_dir,
-            settings=ChromaSettings(anonymized_telemetry=False)
+        # Concurrent query embeddings share batched encoder calls
+        self.query_batcher = EmbeddingBatcher(
+            self.generate_embeddings,
+            max_batch_size=settings.query_batch_max_size,
+            max_wait_ms=settings.query_batch_wait_ms
         )
         
-        # Get or create collection
-        self.collection = self.chroma_client.get_or_create_collection(
-            name="knowledge_base",
-            metadata={"hnsw:space": "cosine"}
+        # Repeated questions reuse their query embedding
+        self.query_cache = QueryEmbeddingCache(settings.query_embedding_cache_size)
+        
+        # Chunk embeddings survive index wipes and rebuilds on disk
+        self.embedding_cache = None
+        if settings.embedding_cache_max_mb > 0:
+            self.embedding_cache = EmbeddingCache(
+                settings.embedding_cache_dir,
+                embedding_model_id(),
+                max_bytes=settings.embedding_cache_max_mb * 1024 * 1024
+            )
+        
+        # Ingestion batches can be spread over encoder worker processes;
+        # queries always use the in-process model for latency
+        self.embedding_pool = None
+        if settings.embedding_pool_workers > 0:
+            self.embedding_pool = EmbeddingPool(settings.embedding_pool_workers, settings.embedding_pool_threads)
+            print(
+                f"[STARTUP] Embedding pool: {settings.embedding_pool_workers} workers x "
+                f"{settings.embedding_pool_threads} threads"
+            )
+        
+        # Optional PCA/truncation applied to both chunk and query vectors
+        self.reducer = load_reducer(self.embedding_model.get_sentence_embedding_dimension())
+        if self.reducer is not None:
+            print(f"[STARTUP] Embedding reduction: {self.reducer.describe()}")
+        self.embedding_dim = (
+            self.reducer.dim if self.reducer is not None
+            else self.embedding_model.get_sentence_embedding_dimension()
         )
+        
+        # Reopen the existing index (checking it was built with this model) or create it
+        self.store = create_vector_store(index_metadata(self.embedding_dim, self.reducer))
+        self._verify_store()
+        
+        # BM25 index kept in step with the vector store for hybrid retrieval
+        self.bm25 = self._open_bm25_index()
+        
+        # Optional cross-encoder that re-scores a wider candidate set
+        self.reranker = load_reranker()
+        if self.reranker is not None:
+            print(
+                f"[STARTUP] Reranker: {settings.rerank_model} over {settings.rerank_candidates} candidates, "
+                f"top {settings.rerank_top_n} kept"
+            )
+    
+    def _reduction_name(self) -> str:
+        return self.reducer.describe() if self.reducer is not None else "none"
+    
+    def _verify_store(self):
+        """
+        Check a reopened index against the configuration.
+        
+        An index built with a different embedding model, dimension or
+        reduction is refused rather than silently mixed with incompatible
+        query vectors.
+        """
+        metadata = self.store.metadata
+        stored_model = metadata.get("embedding_model")
+        stored_dim = metadata.get("embedding_dim")
+        if stored_dim is None:
+            # Indexes created before the model was recorded: check a stored vector
+            stored_dim = self.store.vector_dim()
+        
+        if stored_model is not None and stored_model != settings.embedding_model:
+            raise RuntimeError(
+                f"Vector index in {settings.chroma_db_dir} was built with embedding model '{stored_model}', "
+                f"but '{settings.embedding_model}' is configured. Switch EMBEDDING_MODEL back, or start "
+                f"once with INDEX_PERSISTENCE=wipe and re-ingest."
+            )
+        if stored_dim is not None and stored_dim != self.embedding_dim:
+            raise RuntimeError(
+                f"Vector index in {settings.chroma_db_dir} holds {stored_dim}-dim vectors, but the "
+                f"current configuration produces {self.embedding_dim}-dim vectors."
+            )
+        stored_reduction = metadata.get("embedding_reduction", "none")
+        if stored_model is not None and stored_reduction != self._reduction_name():
+            raise RuntimeError(
+                f"Vector index in {settings.chroma_db_dir} was built with embedding reduction "
+                f"'{stored_reduction}', but '{self._reduction_name()}' is configured. Restore the "
+                f"matching EMBEDDING_REDUCTION / {settings.pca_path}, or start once with "
+                f"INDEX_PERSISTENCE=wipe and re-ingest."
+            )
+        if stored_model is None:
+            print("[WARNING] Existing collection does not record its embedding model; assuming it matches")
+    
+    def _open_bm25_index(self) -> Optional[BM25Index]:
+        """Open the BM25 index, rebuilding it from the stored chunks if it is out of step."""
+        path = settings.bm25_index_dir or os.path.join(settings.chroma_db_dir, "bm25")
+        if settings.hybrid_lexical_weight <= 0:
+            if os.path.exists(path):
+                # Not maintained while disabled, so it would be stale if re-enabled later
+                shutil.rmtree(path)
+                print("[STARTUP] Hybrid retrieval disabled; removed the BM25 index")
+            return None
+        
+        bm25 = BM25Index(path)
+        count = self.store.count()
+        if bm25.count() != count:
+            print(f"[STARTUP] Rebuilding BM25 index from {count} stored chunks")
+            bm25.clear()
+            for ids, documents in self.store.iter_documents(batch_size=1024):
+                bm25.add(ids, documents)
+            bm25.flush()
+        return bm25
+    
+    def _flush(self):
+        """Persist the vector store and the BM25 index after an ingest operation."""
+        self.store.flush()
+        if self.bm25 is not None:
+            self.bm25.flush()
+    
+    def generate_embeddings(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Generate embeddings for a list of texts as a contiguous float32 matrix."""
+        embeddings = self.embedding_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    
+    def reduce_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        """Apply the configured dimensionality reduction, if any, to model embeddings."""
+        if self.reducer is None:
+            return embeddings
+        return self.reducer.transform(embeddings)
+    
+    def iter_embedding_batches(
+        self,
+        texts: List[str],
+        batch_size: int = None
+    ) -> Iterator[Tuple[List[int], np.ndarray]]:
+        """
+        Embed texts in length-sorted batches, yielding (positions, embeddings).
+        
+        Sorting by character length (a close proxy for token count that costs no
+        extra tokenizer pass) keeps texts of similar length together, so each
+        batch pads little, and only a few batches of vectors are held at a time.
+        positions are indices into texts, so callers can restore the original
+        order. With an embedding pool the batches are encoded in parallel by
+        the worker processes and still yielded in order.
+        
+        Texts found in the persistent embedding cache are yielded first without
+        being encoded; newly encoded batches are added to the cache. The cache
+        holds full-size vectors; the configured reduction is applied on output.
+        """
+        if not texts:
+            return
+        batch_size = batch_size or settings.embedding_batch_size
+        pending = list(range(len(texts)))
+        
+        keys = None
+        if self.embedding_cache is not None:
+            keys = [self.embedding_cache.content_key(text) for text in texts]
+            found, cached = self.embedding_cache.get_many(keys)
+            for start in range(0, len(found), batch_size):
+                yield found[start:start + batch_size], self.reduce_embeddings(cached[start:start + batch_size])
+            found = set(found)
+            pending = [i for i in pending if i not in found]
+            if not pending:
+                return
+        
+        order = sorted(pending, key=lambda i: len(texts[i]))
+        
+        batches = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+        
+        if self.embedding_pool is not None:
+            results = self.embedding_pool.map([texts[i] for i in positions] for positions in batches)
+        else:
+            results = (
+                self.generate_embeddings([texts[i] for i in positions], batch_size=len(positions))
+                for positions in batches
+            )
+        for positions, embeddings in zip(batches, results):
+            if keys is not None:
+                self.embedding_cache.put_many([keys[i] for i in positions], embeddings)
+            yield positions, self.reduce_embeddings(embeddings)
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query, using the LRU cache and batching concurrent misses."""
+        query_embedding = self.query_cache.get(query, embedding_model_id())
+        if query_embedding is None:
+            query_embedding = self.reduce_embeddings(self.query_batcher.embed(query))
+            self.query_cache.put(query, embedding_model_id(), query_embedding)
+        return query_embedding
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed many queries as one matrix, one row per query.
+        
+        Cached queries are reused; the rest (each distinct question once) are
+        encoded together in a single encoder call.
+        """
+        model_id = embedding_model_id()
+        embeddings = [self.query_cache.get(query, model_id) for query in queries]
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        if missing:
+            encoded = self.reduce_embeddings(
+                self.generate_embeddings(missing, batch_size=settings.embedding_batch_size)
+            )
+            fresh = dict(zip(missing, encoded))
+            for query, embedding in fresh.items():
+                self.query_cache.put(query, model_id, embedding)
+            embeddings = [fresh[query] if embedding is None else embedding for query, embedding in zip(queries, embeddings)]
+        return np.ascontiguousarray(np.vstack(embeddings), dtype=np.float32)
+    
+    def _final_count(self, top_k: Optional[int]) -> int:
+        """Chunks returned per query: the request's top_k, else the configured default."""
+        if top_k:
+            return top_k
+        return settings.rerank_top_n if self.reranker is not None else settings.top_k_results
+    
+    def _candidate_count(self, top_k: int) -> int:
+        """Chunks retrieved per query before reranking (just top_k without a reranker)."""
+        if self.reranker is None:
+            return top_k
+        return max(top_k, settings.rerank_candidates)
+    
+    def _search_depth(self, top_k: int) -> int:
+        """Vector hits to fetch per query: fusion needs a deeper candidate list."""
+        if self.bm25 is None:
+            return top_k
+        return max(top_k, settings.hybrid_candidates)
+    
+    def _retrieve(
+        self,
+        query: str,
+        query_embedding: Optional[np.ndarray],
+        hits: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Final results for a query from its vector hits.
+        
+        Hits below the similarity threshold are dropped. With hybrid retrieval
+        the remaining ranking is fused with the BM25 ranking by weighted
+        reciprocal rank fusion. Chunks found only by BM25 are scored against
+        query_embedding too, so they carry a similarity and the threshold
+        applies to them the same way.
+        """
+        vector_hits = [hit for hit in hits if hit["similarity"] >= settings.similarity_threshold]
+        if self.bm25 is None:
+            return [
+                {"text": hit["text"], "metadata": hit["metadata"], "similarity": hit["similarity"]}
+                for hit in vector_hits[:top_k]
+            ]
+        
+        lexical_hits = self.bm25.search(query, max(top_k, settings.hybrid_candidates))
+        records = {hit["id"]: hit for hit in hits}
+        missing = [chunk_id for chunk_id, _ in lexical_hits if chunk_id not in records]
+        if missing:
+            fetched = self.store.fetch(missing, include_embeddings=True)
+            similarities = self._similarities(query_embedding, fetched)
+            for record, similarity in zip(fetched, similarities):
+                records[record["id"]] = {**record, "similarity": similarity}
+        lexical_hits = [
+            (chunk_id, score) for chunk_id, score in lexical_hits
+            if chunk_id in records and records[chunk_id]["similarity"] >= settings.similarity_threshold
+        ]
+        
+        weight = settings.hybrid_lexical_weight
+        fused = reciprocal_rank_fusion(
+            [[hit["id"] for hit in vector_hits], [chunk_id for chunk_id, _ in lexical_hits]],
+            [1 - weight, weight],
+            k=settings.hybrid_rrf_k
+        )[:top_k]
+        
+        bm25_scores = dict(lexical_hits)
+        return [
+            {
+                "text": records[chunk_id]["text"],
+                "metadata": records[chunk_id]["metadata"],
+                "similarity": records[chunk_id]["similarity"],
+                "bm25_score": bm25_scores.get(chunk_id),
+                "fusion_score": fusion_score
+            }
+            for chunk_id, fusion_score in fused
+        ]
     
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of texts."""
-        embeddings = self.embedding_model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+    def _similarities(self, query_embedding: np.ndarray, records: List[Dict[str, Any]]) -> List[float]:
+        """
+        Cosine similarity of fetched chunks to a query embedding.
+        
+        Chunks are scored against the vectors the store returned with them.
+        For stores that keep no exact vectors (a trained FAISS index), chunk
+        vectors come from the embedding cache, and failing that are encoded
+        through the query batcher.
+        """
+        if not records:
+            return []
+        embeddings = np.zeros((len(records), len(query_embedding)), dtype=np.float32)
+        missing = []
+        for i, record in enumerate(records):
+            if "embedding" in record:
+                embeddings[i] = record["embedding"]
+            else:
+                missing.append(i)
+        if missing and self.embedding_cache is not None:
+            keys = [self.embedding_cache.content_key(records[i]["text"]) for i in missing]
+            found, cached = self.embedding_cache.get_many(keys)
+            if len(found):
+                embeddings[[missing[j] for j in found]] = self.reduce_embeddings(cached)
+            found = set(found)
+            missing = [i for j, i in enumerate(missing) if j not in found]
+        if missing:
+            encoded = self.query_batcher.embed_many([records[i]["text"] for i in missing])
+            embeddings[missing] = self.reduce_embeddings(np.vstack(encoded))
+        norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_embedding)
+        return (embeddings @ query_embedding / np.clip(norms, 1e-12, None)).tolist()
     
-    def add_documents(self, chunks: List[str], metadata: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Add document chunks to the vector database."""
+    def add_documents(
+        self,
+        chunks: List[str],
+        metadata: List[Dict[str, Any]],
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Add document chunks to the vector database.
+        
+        Chunk IDs are derived from the chunk content and its source file, so
+        chunks that are already indexed are skipped without being embedded.
+        New chunks are embedded in length-sorted batches of EMBEDDING_BATCH_SIZE
+        and each batch is written before the next is encoded, keeping memory
+        flat for large documents. chunk_ids in the result follow the input order.
+        progress_callback, if given, is called with (chunks_processed,
+        total_chunks) after each batch.
+        """
         try:
             print(f"[DEBUG] Adding {len(chunks)} chunks to collection")
             print(f"[DEBUG] First chunk preview: {chunks[0][:100]}...")
             
-            # Generate unique IDs for each chunk
-            ids = [str(uuid.uuid4()) for _ in chunks]
+            # Content-addressed IDs for each chunk
+            ids = [
+                make_chunk_id(chunk, meta.get("filename", ""))
+                for chunk, meta in zip(chunks, metadata)
+            ]
             
-            # Generate embeddings
-            embeddings = self.generate_embeddings(chunks)
-            print(f"[DEBUG] Generated {len(embeddings)} embeddings")
+            # Repeated chunks within the document are stored once
+            seen = set()
+            unique = []
+            for i, chunk_id in enumerate(ids):
+                if chunk_id not in seen:
+                    seen.add(chunk_id)
+                    unique.append(i)
             
-            # Add to ChromaDB
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=chunks,
-                metadatas=metadata
-            )
+            # Skip chunks that are already indexed
+            new = []
+            for start in range(0, len(unique), ADD_BATCH_SIZE):
+                batch = unique[start:start + ADD_BATCH_SIZE]
+                existing = self.store.existing_ids([ids[i] for i in batch])
+                new.extend(i for i in batch if ids[i] not in existing)
+            
+            done = len(unique) - len(new)
+            if progress_callback is not None:
+                progress_callback(done, len(unique))
+            
+            # Embed in length-sorted batches and write each batch as soon as it is ready
+            new_chunks = [chunks[i] for i in new]
+            for positions, embeddings in self.iter_embedding_batches(new_chunks):
+                batch = [new[p] for p in positions]
+                self.store.add(
+                    ids=[ids[i] for i in batch],
+                    embeddings=embeddings,
+                    documents=[chunks[i] for i in batch],
+                    metadatas=[metadata[i] for i in batch]
+                )
+                if self.bm25 is not None:
+                    self.bm25.add([ids[i] for i in batch], [chunks[i] for i in batch])
+                done += len(batch)
+                if progress_callback is not None:
+                    progress_callback(done, len(unique))
+            num_added = len(new)
+            self._flush()
+            
+            num_deduplicated = len(chunks) - num_added
+            print(f"[DEBUG] Generated {num_added} embeddings, skipped {num_deduplicated} duplicate chunks")
             
             # Verify addition
-            count = self.collection.count()
+            count = self.store.count()
             print(f"[DEBUG] Collection now has {count} total documents")
             
             return {
                 "success": True,
-                "num_chunks_added": len(chunks),
+                "num_chunks_added": num_added,
+                "num_chunks_deduplicated": num_deduplicated,
                 "chunk_ids": ids
             }
         except Exception as e:
@@ -67,13 +459,128 @@ class RAGEngine:
                 "error": str(e)
             }
     
-    def search(self, query: str, top_k: int = None) -> Dict[str, Any]:
-        """Search for relevant documents using semantic similarity."""
-        top_k = top_k or settings.top_k_results
+    def get_document_manifest(self, filename: str) -> List[str]:
+        """IDs of the chunks currently stored for a document."""
+        return self.store.ids_for_source(filename)
+    
+    def sync_document(
+        self,
+        filename: str,
+        chunks: List[str],
+        metadata: List[Dict[str, Any]],
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Index a (possibly re-uploaded) document incrementally.
+        
+        The document's new chunks are diffed against its stored manifest: only
+        new or changed chunks are embedded, chunks that no longer appear are
+        deleted, and unchanged chunks just get their position metadata updated.
+        """
+        result = self.sync_documents([(filename, chunks, metadata)], progress_callback=progress_callback)
+        if result["success"]:
+            result["chunk_ids"] = result["chunk_ids"][0]
+        return result
+    
+    def sync_documents(
+        self,
+        documents: List[Tuple[str, List[str], List[Dict[str, Any]]]],
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Sync several (filename, chunks, metadata) documents like sync_document.
+        
+        Each document is diffed against its own manifest, then the new or
+        changed chunks of all of them are embedded and written together, so
+        small documents share encoder batches. chunk_ids holds one list per
+        document; the counts are totals.
+        """
+        try:
+            all_ids = []
+            changed_chunks: List[str] = []
+            changed_metadata: List[Dict[str, Any]] = []
+            num_kept = 0
+            num_removed = 0
+            for filename, chunks, metadata in documents:
+                ids = [make_chunk_id(chunk, filename) for chunk in chunks]
+                all_ids.append(ids)
+                stored_ids = set(self.get_document_manifest(filename))
+                
+                # Drop chunks that are no longer part of the document
+                removed_ids = list(stored_ids - set(ids))
+                for start in range(0, len(removed_ids), ADD_BATCH_SIZE):
+                    self.store.delete(removed_ids[start:start + ADD_BATCH_SIZE])
+                if self.bm25 is not None:
+                    self.bm25.delete(removed_ids)
+                num_removed += len(removed_ids)
+                
+                # Unchanged chunks keep their embeddings; refresh their metadata
+                kept = {}
+                for i, chunk_id in enumerate(ids):
+                    if chunk_id in stored_ids and chunk_id not in kept:
+                        kept[chunk_id] = metadata[i]
+                kept_ids = list(kept)
+                for start in range(0, len(kept_ids), ADD_BATCH_SIZE):
+                    batch_ids = kept_ids[start:start + ADD_BATCH_SIZE]
+                    self.store.update_metadata(batch_ids, [kept[i] for i in batch_ids])
+                num_kept += len(kept_ids)
+                
+                # New or changed chunks are embedded below, together
+                for i, chunk_id in enumerate(ids):
+                    if chunk_id not in stored_ids:
+                        changed_chunks.append(chunks[i])
+                        changed_metadata.append(metadata[i])
+            
+            num_added = 0
+            if changed_chunks:
+                def report(done: int, total: int):
+                    if progress_callback is not None:
+                        progress_callback(num_kept + done, num_kept + total)
+                
+                add_result = self.add_documents(changed_chunks, changed_metadata, progress_callback=report)
+                if not add_result["success"]:
+                    return add_result
+                num_added = add_result["num_chunks_added"]
+            elif progress_callback is not None:
+                progress_callback(num_kept, num_kept)
+            self._flush()
+            
+            num_chunks = sum(len(ids) for ids in all_ids)
+            print(
+                f"[DEBUG] Synced {len(documents)} document(s): {num_added} new, {num_kept} unchanged, "
+                f"{num_removed} removed"
+            )
+            
+            return {
+                "success": True,
+                "num_chunks_added": num_added,
+                "num_chunks_deduplicated": num_chunks - num_added,
+                "num_chunks_removed": num_removed,
+                "chunk_ids": all_ids
+            }
+        except Exception as e:
+            print(f"[ERROR] Failed to sync documents: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def search(self, query: str, top_k: int = None, search_ef: int = None) -> Dict[str, Any]:
+        """
+        Search for relevant documents using semantic similarity, fused with
+        BM25 when hybrid retrieval is on and reranked by the cross-encoder
+        when one is configured (search_ef overrides the index's search
+        breadth; ef_applied says whether the store honoured it, None if not
+        given). timing reports the milliseconds spent retrieving and
+        reranking.
+        """
+        top_k = self._final_count(top_k)
+        candidates = self._candidate_count(top_k)
+        start = time.perf_counter()
         
         try:
             # Check if collection has any documents
-            count = self.collection.count()
+            count = self.store.count()
             print(f"[DEBUG] Collection has {count} documents")
             
             if count == 0:
@@ -82,48 +589,43 @@ class RAGEngine:
                     "query": query,
                     "results": [],
                     "num_results": 0,
+                    "timing": {"retrieval_ms": round((time.perf_counter() - start) * 1000, 2), "rerank_ms": 0.0},
+                    "ef_applied": self._ef_applied(search_ef),
                     "debug": "No documents in collection"
                 }
             
             # Generate query embedding
-            query_embedding = self.generate_embeddings([query])[0]
-            
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(top_k, count)
-            )
-            
-            # Format results
-            documents = results.get('documents', [[]])[0]
-            metadatas = results.get('metadatas', [[]])[0]
-            distances = results.get('distances', [[]])[0]
+            query_embedding = self.embed_query(query)
             
-            print(f"[DEBUG] Found {len(documents)} raw results")
-            print(f"[DEBUG] Distances: {distances}")
+            # Search the vector store
+            hits = self.store.query(query_embedding[np.newaxis, :], self._search_depth(candidates), search_ef=search_ef)[0]
             
-            # Convert distances to similarity scores (1 - distance for cosine)
-            similarities = [1 - dist for dist in distances]
-            print(f"[DEBUG] Similarities: {similarities}")
+            print(f"[DEBUG] Found {len(hits)} raw results")
+            print(f"[DEBUG] Similarities: {[hit['similarity'] for hit in hits]}")
             print(f"[DEBUG] Threshold: {settings.similarity_threshold}")
             
-            # Filter by similarity threshold
-            filtered_results = []
-            for doc, meta, sim in zip(documents, metadatas, similarities):
-                if sim >= settings.similarity_threshold:
-                    filtered_results.append({
-                        "text": doc,
-                        "metadata": meta,
-                        "similarity": sim
-                    })
+            # Filter by similarity threshold (and fuse with BM25 hits)
+            filtered_results = self._retrieve(query, query_embedding, hits, candidates)
+            retrieval_ms = (time.perf_counter() - start) * 1000
             
             print(f"[DEBUG] Filtered to {len(filtered_results)} results")
             
+            rerank_ms = 0.0
+            if self.reranker is not None and filtered_results:
+                filtered_results, rerank_timing = self.reranker.rerank(query, filtered_results, top_k)
+                rerank_ms = rerank_timing["rerank_ms"]
+                print(
+                    f"[DEBUG] Reranked {rerank_timing['pairs_scored']} candidates in {rerank_ms:.1f} ms "
+                    f"({rerank_timing['pairs_skipped']} skipped by the latency cap)"
+                )
+            
             return {
                 "success": True,
                 "query": query,
                 "results": filtered_results,
-                "num_results": len(filtered_results)
+                "num_results": len(filtered_results),
+                "timing": {"retrieval_ms": round(retrieval_ms, 2), "rerank_ms": rerank_ms},
+                "ef_applied": self._ef_applied(search_ef)
             }
         except Exception as e:
             print(f"[ERROR] Search failed: {str(e)}")
@@ -133,14 +635,80 @@ class RAGEngine:
                 "results": []
             }
     
+    def _ef_applied(self, search_ef: Optional[int]) -> Optional[bool]:
+        return self.store.applies_search_ef() if search_ef else None
+    
+    def search_batch(self, queries: List[str], top_k: int = None, search_ef: int = None) -> Dict[str, Any]:
+        """
+        Search for many queries at once.
+        
+        All queries are embedded in one encoder call and looked up with one
+        multi-query vector store search, and all their rerank candidates are
+        scored in one run of cross-encoder batches. results holds one entry
+        per query, in input order, shaped like search(); timing covers the
+        whole batch.
+        """
+        top_k = self._final_count(top_k)
+        candidates = self._candidate_count(top_k)
+        start = time.perf_counter()
+        
+        try:
+            if not queries or self.store.count() == 0:
+                query_embeddings = [None] * len(queries)
+                hits_per_query = [[] for _ in queries]
+            else:
+                query_embeddings = self.embed_queries(queries)
+                hits_per_query = self.store.query(query_embeddings, self._search_depth(candidates), search_ef=search_ef)
+            
+            retrieved = [
+                self._retrieve(query, query_embedding, hits, candidates)
+                for query, query_embedding, hits in zip(queries, query_embeddings, hits_per_query)
+            ]
+            retrieval_ms = (time.perf_counter() - start) * 1000
+            rerank_ms = 0.0
+            if self.reranker is not None and any(retrieved):
+                retrieved, rerank_timing = self.reranker.rerank_many(queries, retrieved, top_k)
+                rerank_ms = rerank_timing["rerank_ms"]
+            
+            results = []
+            for query, filtered_results in zip(queries, retrieved):
+                results.append({
+                    "query": query,
+                    "results": filtered_results,
+                    "num_results": len(filtered_results)
+                })
+            print(f"[DEBUG] Batch search: {len(queries)} queries, top_k={top_k}")
+            
+            return {
+                "success": True,
+                "results": results,
+                "timing": {"retrieval_ms": round(retrieval_ms, 2), "rerank_ms": rerank_ms},
+                "ef_applied": self._ef_applied(search_ef)
+            }
+        except Exception as e:
+            print(f"[ERROR] Batch search failed: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "results": []
+            }
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the knowledge base."""
         try:
-            count = self.collection.count()
+            count = self.store.count()
             return {
                 "success": True,
                 "total_chunks": count,
-                "collection_name": self.collection.name
+                "collection_name": self.store.name,
+                "vector_store": settings.vector_store,
+                "vector_store_stats": self.store.get_stats(),
+                "bm25_index": self.bm25.get_stats() if self.bm25 is not None else None,
+                "reranker": self.reranker.get_stats() if self.reranker is not None else None,
+                "query_batching": self.query_batcher.get_stats(),
+                "query_embedding_cache": self.query_cache.get_stats(),
+                "embedding_pool": self.embedding_pool.get_stats() if self.embedding_pool is not None else None,
+                "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache is not None else None
             }
         except Exception as e:
             return {
@@ -151,11 +719,9 @@ class RAGEngine:
     def clear_collection(self) -> Dict[str, Any]:
         """Clear all documents from the collection."""
         try:
-            self.chroma_client.delete_collection("knowledge_base")
-            self.collection = self.chroma_client.create_collection(
-                name="knowledge_base",
-                metadata={"hnsw:space": "cosine"}
-            )
+            self.store.clear()
+            if self.bm25 is not None:
+                self.bm25.clear()
             return {
                 "success": True,
                 "message": "Collection cleared successfully"
@@ -165,3 +731,12 @@ class RAGEngine:
                 "success": False,
                 "error": str(e)
             }
+    
+    def close(self):
+        """Persist the vector store and BM25 index and stop the ingestion embedding pool, if any."""
+        self.store.close()
+        if self.bm25 is not None:
+            self.bm25.flush()
+        if self.embedding_pool is not None:
+            self.embedding_pool.shutdown()
+            self.embedding_pool = None
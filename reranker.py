@@ -0,0 +1,129 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from config import settings
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores retrieved chunks with a cross-encoder on CPU.
+    
+    A cross-encoder reads the query and a chunk together, so it ranks far more
+    precisely than the bi-encoder cosine similarity used for retrieval, but
+    costs one transformer pass per (query, chunk) pair. Pairs are scored in
+    batches of batch_size. When max_latency_ms is set, scoring stops before a
+    batch that would (judging by the previous batch) run past the cap; the
+    unscored candidates keep their retrieval order behind the scored ones.
+    The first batch is always scored.
+    """
+    
+    def __init__(self, model_name: str, batch_size: int = 16, max_latency_ms: float = 0):
+        from sentence_transformers import CrossEncoder
+        
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = max(batch_size, 1)
+        self.max_latency_ms = max_latency_ms
+        self.queries = 0
+        self.pairs_scored = 0
+        self.pairs_skipped = 0
+        self.total_ms = 0.0
+        self.lock = threading.Lock()
+    
+    def _score(self, pairs: List[Tuple[str, str]]) -> Tuple[np.ndarray, float]:
+        """Score pairs batch by batch until done or the latency cap is reached."""
+        start = time.perf_counter()
+        scores = []
+        batch_ms = 0.0
+        for batch_start in range(0, len(pairs), self.batch_size):
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if self.max_latency_ms > 0 and scores and elapsed_ms + batch_ms > self.max_latency_ms:
+                break
+            batch_begin = time.perf_counter()
+            batch = pairs[batch_start:batch_start + self.batch_size]
+            scores.append(np.asarray(
+                self.model.predict(batch, batch_size=len(batch), show_progress_bar=False, convert_to_numpy=True),
+                dtype=np.float32
+            ).reshape(-1))
+            batch_ms = (time.perf_counter() - batch_begin) * 1000
+        scored = np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+        return scored, (time.perf_counter() - start) * 1000
+    
+    def rerank_many(
+        self,
+        queries: List[str],
+        candidate_lists: List[List[Dict[str, Any]]],
+        top_n: int
+    ) -> Tuple[List[List[Dict[str, Any]]], Dict[str, Any]]:
+        """
+        Rerank each query's candidates and keep the best top_n per query.
+        
+        All (query, chunk) pairs are scored in one run of batches, so a batch
+        of questions shares the cost of each cross-encoder call. Candidates
+        are interleaved by rank before scoring, so if the latency cap cuts
+        scoring short every query has had its best candidates scored. Each
+        returned chunk gains a rerank_score (None if it was not scored).
+        """
+        order = []
+        depth = max((len(candidates) for candidates in candidate_lists), default=0)
+        for rank in range(depth):
+            for position, candidates in enumerate(candidate_lists):
+                if rank < len(candidates):
+                    order.append((position, rank))
+        
+        pairs = [(queries[position], candidate_lists[position][rank]["text"]) for position, rank in order]
+        scores, elapsed_ms = self._score(pairs)
+        
+        rerank_scores: List[Dict[int, float]] = [{} for _ in candidate_lists]
+        for (position, rank), score in zip(order, scores):
+            rerank_scores[position][rank] = float(score)
+        
+        results = []
+        for candidates, query_scores in zip(candidate_lists, rerank_scores):
+            # Scored chunks by score, then unscored ones in retrieval order
+            ranked = sorted(
+                range(len(candidates)),
+                key=lambda rank: (rank not in query_scores, -query_scores.get(rank, 0.0), rank)
+            )
+            results.append([
+                {**candidates[rank], "rerank_score": query_scores.get(rank)}
+                for rank in ranked[:top_n]
+            ])
+        
+        with self.lock:
+            self.queries += len(queries)
+            self.pairs_scored += len(scores)
+            self.pairs_skipped += len(pairs) - len(scores)
+            self.total_ms += elapsed_ms
+        return results, {
+            "rerank_ms": round(elapsed_ms, 2),
+            "pairs_scored": len(scores),
+            "pairs_skipped": len(pairs) - len(scores)
+        }
+    
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_n: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Rerank one query's candidates; see rerank_many()."""
+        results, timing = self.rerank_many([query], [candidates], top_n)
+        return results[0], timing
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "queries": self.queries,
+            "pairs_scored": self.pairs_scored,
+            "pairs_skipped": self.pairs_skipped,
+            "average_rerank_ms": round(self.total_ms / self.queries, 2) if self.queries else 0.0
+        }
+
+
+def load_reranker() -> Optional[CrossEncoderReranker]:
+    """The configured cross-encoder reranker, or None when RERANK_ENABLED is off."""
+    if not settings.rerank_enabled:
+        return None
+    return CrossEncoderReranker(
+        settings.rerank_model,
+        batch_size=settings.rerank_batch_size,
+        max_latency_ms=settings.rerank_max_latency_ms
+    )
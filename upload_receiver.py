@@ -0,0 +1,187 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiofiles
+from fastapi import Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+# Non-file form fields are read and discarded; a longer one aborts the upload
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+# Header block of one multipart part
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised as soon as an uploaded file exceeds the size limit."""
+    
+    def __init__(self, filename: str, max_bytes: int):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        super().__init__(f"{filename} exceeds the {max_bytes // (1024 * 1024)}MB limit")
+
+
+class UploadLimitError(Exception):
+    """Raised as soon as a request exceeds the per-request file count or total size limit."""
+
+
+class UploadFormatError(Exception):
+    """Raised when the request body is not a usable multipart upload."""
+
+
+class _PartEvents:
+    """Collects parser callbacks so they can be handled with async file I/O."""
+    
+    def __init__(self):
+        self.events: List[tuple] = []
+        self.header_field = b""
+        self.header_value = b""
+        self.header_bytes = 0
+        self.headers: Dict[bytes, bytes] = {}
+    
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+    
+    def on_part_begin(self):
+        self.headers = {}
+        self.header_bytes = 0
+    
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self.events.append(("data", data[start:end]))
+    
+    def on_part_end(self):
+        self.events.append(("end", None))
+    
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._count_header(end - start)
+        self.header_field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._count_header(end - start)
+        self.header_value += data[start:end]
+    
+    def _count_header(self, size: int):
+        self.header_bytes += size
+        if self.header_bytes > MAX_PART_HEADER_BYTES:
+            raise UploadFormatError(f"Part headers exceed {MAX_PART_HEADER_BYTES // 1024}KB")
+    
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+    
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        self.events.append(("begin", filename.decode("utf-8", "replace") if filename is not None else None))
+
+
+async def receive_uploads(
+    request: Request,
+    upload_dir: str,
+    max_bytes: int,
+    max_total_bytes: int = 0,
+    max_files: int = 0
+) -> List[Dict[str, str]]:
+    """
+    Stream the file parts of a multipart request straight to disk.
+    
+    Each file is written in chunks to a temp file in upload_dir, and all files
+    are moved into place atomically once the whole body has been received.
+    Nothing is buffered beyond one network chunk; if a file passes max_bytes,
+    the request passes max_total_bytes or max_files (0 = no limit), or two
+    files share a name, the upload is aborted immediately and its temp files
+    are removed. Non-file form fields are discarded but count toward
+    max_total_bytes, and each may be at most MAX_FORM_FIELD_BYTES.
+    
+    Returns a list of {"filename", "file_path"} in upload order.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadFormatError("Expected a multipart/form-data upload")
+    
+    events = _PartEvents()
+    parser = MultipartParser(params[b"boundary"], events.callbacks())
+    
+    completed: List[Dict] = []  # Finished file parts, still at their temp paths
+    current: Optional[Dict] = None  # File part being written
+    field_size = 0  # Bytes of the current non-file part
+    filenames = set()
+    total_size = 0
+    
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            
+            for kind, value in events.events:
+                if kind == "begin":
+                    if value is None:
+                        # Not a file field
+                        current = None
+                        field_size = 0
+                        continue
+                    # Keep only the base name so uploads cannot escape upload_dir
+                    filename = Path(value.replace("\\", "/")).name
+                    if filename in ("", ".", ".."):
+                        raise UploadFormatError(f"Invalid filename: {value!r}")
+                    if filename in filenames:
+                        raise UploadFormatError(f"Duplicate filename in one upload: {filename}")
+                    filenames.add(filename)
+                    if max_files and len(filenames) > max_files:
+                        raise UploadLimitError(f"At most {max_files} files per upload")
+                    fd, temp_path = tempfile.mkstemp(dir=upload_dir, prefix=".upload-")
+                    os.close(fd)
+                    current = {
+                        "filename": filename,
+                        "temp_path": temp_path,
+                        "file": await aiofiles.open(temp_path, "wb"),
+                        "size": 0
+                    }
+                elif kind == "data":
+                    total_size += len(value)
+                    if current is None:
+                        field_size += len(value)
+                        if field_size > MAX_FORM_FIELD_BYTES:
+                            raise UploadLimitError(f"Form fields are limited to {MAX_FORM_FIELD_BYTES // 1024}KB")
+                    else:
+                        current["size"] += len(value)
+                        if current["size"] > max_bytes:
+                            raise UploadTooLargeError(current["filename"], max_bytes)
+                    if max_total_bytes and total_size > max_total_bytes:
+                        raise UploadLimitError(f"Upload exceeds the {max_total_bytes // (1024 * 1024)}MB per-request limit")
+                    if current is not None:
+                        await current["file"].write(value)
+                elif kind == "end" and current is not None:
+                    await current["file"].close()
+                    completed.append(current)
+                    current = None
+            events.events.clear()
+        
+        parser.finalize()
+        if current is not None:
+            raise UploadFormatError("Upload ended before the file was complete")
+        
+        received = []
+        for part in completed:
+            file_path = os.path.join(upload_dir, part["filename"])
+            os.replace(part["temp_path"], file_path)
+            received.append({"filename": part["filename"], "file_path": file_path})
+    except BaseException:
+        if current is not None:
+            await current["file"].close()
+            completed.append(current)
+        for part in completed:
+            if os.path.exists(part["temp_path"]):
+                os.remove(part["temp_path"])
+        raise
+    return received
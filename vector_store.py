@@ -0,0 +1,137 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class VectorStore:
+    """
+    Interface RAGEngine uses to store and search chunk vectors.
+    
+    Embeddings passed in are float32 matrices, one row per chunk. query()
+    takes a matrix of query vectors and returns, per query, up to top_k hits
+    as dicts with "id", "text", "metadata" and "similarity" (cosine, higher is
+    better), best first. search_ef optionally widens or narrows the search of
+    approximate backends for that call (HNSW ef for chroma, nprobe for faiss);
+    exact backends ignore it. index_metadata is recorded with the index when it is
+    created, so a reopened index can be checked against the configuration.
+    """
+    
+    name = "knowledge_base"
+    
+    def __init__(self, index_metadata: Dict[str, Any]):
+        self.index_metadata = index_metadata
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata the stored index was created with."""
+        raise NotImplementedError
+    
+    @property
+    def stores_exact_vectors(self) -> bool:
+        """False if iter_entries() returns decoded approximations of the added vectors."""
+        return True
+    
+    def vector_dim(self) -> Optional[int]:
+        """Dimension of the stored vectors, or None if the index is empty."""
+        raise NotImplementedError
+    
+    def count(self) -> int:
+        raise NotImplementedError
+    
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        """The subset of ids that are already stored."""
+        raise NotImplementedError
+    
+    def ids_for_source(self, filename: str) -> List[str]:
+        """IDs of all chunks whose metadata filename matches."""
+        raise NotImplementedError
+    
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]):
+        raise NotImplementedError
+    
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        raise NotImplementedError
+    
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+    
+    def query(self, embeddings: np.ndarray, top_k: int, search_ef: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        raise NotImplementedError
+    
+    def applies_search_ef(self) -> bool:
+        """Whether query() honours search_ef (False for exact backends, or when it cannot be set)."""
+        return False
+    
+    def fetch(self, ids: List[str], include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """
+        Stored chunks for ids, as {"id", "text", "metadata"} dicts in ids order (missing IDs skipped).
+        
+        With include_embeddings, each dict also holds the stored vector under
+        "embedding" where the store keeps exact vectors (see stores_exact_vectors).
+        """
+        raise NotImplementedError
+    
+    def iter_entries(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], List[str], np.ndarray]]:
+        """Yield (ids, documents, embeddings) batches covering the whole index."""
+        raise NotImplementedError
+    
+    def iter_documents(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], List[str]]]:
+        """Yield (ids, documents) batches covering the whole index."""
+        for ids, documents, _ in self.iter_entries(batch_size):
+            yield ids, documents
+    
+    def clear(self):
+        """Delete everything and recreate an empty index with index_metadata."""
+        raise NotImplementedError
+    
+    def flush(self):
+        """Persist pending changes (called after each ingest operation)."""
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Backend-specific statistics for /stats."""
+        return {}
+    
+    def close(self):
+        self.flush()
+
+
+def create_vector_store(index_metadata: Dict[str, Any], backend: str = None, exclusive: bool = False) -> VectorStore:
+    """
+    Open the vector store selected by VECTOR_STORE ("chroma", "numpy" or "faiss").
+    
+    exclusive opens a FAISS index for rewriting and fails if another process
+    (such as the server) has it open.
+    """
+    from config import settings
+    
+    backend = (backend or settings.vector_store).lower()
+    if backend == "chroma":
+        from chroma_store import ChromaVectorStore
+        return ChromaVectorStore(
+            settings.chroma_db_dir,
+            index_metadata,
+            hnsw_m=settings.hnsw_m,
+            hnsw_construction_ef=settings.hnsw_construction_ef,
+            hnsw_search_ef=settings.hnsw_search_ef
+        )
+    if backend == "numpy":
+        from numpy_store import NumpyVectorStore
+        # Kept inside the Chroma directory by default so INDEX_PERSISTENCE=wipe clears it too
+        path = settings.numpy_store_dir or os.path.join(settings.chroma_db_dir, "numpy_store")
+        return NumpyVectorStore(path, index_metadata)
+    if backend == "faiss":
+        from faiss_store import HAS_FAISS, FaissVectorStore
+        if not HAS_FAISS:
+            raise ValueError("VECTOR_STORE=faiss requires the faiss-cpu package")
+        return FaissVectorStore(
+            settings.faiss_index_dir or os.path.join(settings.chroma_db_dir, "faiss_ivfpq"),
+            index_metadata,
+            nlist=settings.faiss_nlist,
+            pq_m=settings.faiss_pq_m,
+            pq_bits=settings.faiss_pq_bits,
+            nprobe=settings.faiss_nprobe,
+            train_size=settings.faiss_train_size,
+            exclusive=exclusive
+        )
+    raise ValueError(f"Unsupported vector store: {backend} (use chroma, numpy or faiss)")